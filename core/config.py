@@ -1,23 +1,104 @@
 # core/config.py
 
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import AliasChoices, Field
+from typing import Optional
 
+# Umgebungsvariable = Feldname (Groß-/Kleinschreibung egal); abweichende,
+# dokumentierte Namen per validation_alias – der Feldname gilt dann weiterhin.
 class AppConfig(BaseSettings):
     # Todoist API
-    todoist_token: str = Field(..., env="TODOIST_TOKEN")
-    todoist_api_url: str = Field(
-        "https://api.todoist.com/rest/v2", env="TODOIST_API_URL"
+    # im Multi-Tenant-Modus optional: Token kommt dann pro Request
+    todoist_token: Optional[str] = None
+    # leer = beim ersten Bedarf per Sync API (user) ermittelt
+    todoist_user_id: Optional[str] = None
+    todoist_api_url: str = "https://api.todoist.com/rest/v2"
+    todoist_timeout: int = Field(
+        5, validation_alias=AliasChoices("TODOIST_TIMEOUT_SEC", "TODOIST_TIMEOUT")
     )
-    todoist_timeout: int = Field(5, env="TODOIST_TIMEOUT_SEC")
+    todoist_sync_url: str = "https://api.todoist.com/sync/v9/sync"
+
+    # HTTP-Transport zu Todoist (ein Pool für REST und Sync)
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_keepalive_expiry: float = Field(
+        60.0, validation_alias=AliasChoices("HTTP_KEEPALIVE_EXPIRY_SEC", "HTTP_KEEPALIVE_EXPIRY")
+    )
+    http2: bool = False  # benötigt das Paket h2 (httpx[http2])
+    # beim Start aufgebaute Verbindungen; Pings halten sie warm (0 = aus)
+    http_warm_connections: int = 2
+    http_ping_interval: float = Field(
+        45.0, validation_alias=AliasChoices("HTTP_PING_INTERVAL_SEC", "HTTP_PING_INTERVAL")
+    )
+
+    # Upstream-Scheduler: Todoist-Quota (Requests pro Fenster), Burst, Retries
+    todoist_rate_limit: int = 1000
+    todoist_rate_window: int = Field(
+        900, validation_alias=AliasChoices("TODOIST_RATE_WINDOW_SEC", "TODOIST_RATE_WINDOW")
+    )
+    todoist_rate_burst: int = 50
+    todoist_max_retries: int = 3
+
+    # Multi-Tenant: ein Service pro Todoist-Token (Authorization: Bearer …)
+    multi_tenant: bool = False
+    tenant_max: int = 500
+    tenant_memory_budget_mb: int = 512
+
+    # Lokale Replica über die Sync API (inkrementell per sync_token)
+    replica_enabled: bool = Field(
+        True, validation_alias=AliasChoices("TODOIST_REPLICA_ENABLED", "REPLICA_ENABLED")
+    )
+    replica_refresh_sec: int = Field(
+        15, validation_alias=AliasChoices("TODOIST_REPLICA_REFRESH_SEC", "REPLICA_REFRESH_SEC")
+    )
+    # Optional: SQLite-Datei für Warmstarts der Replica (leer = nur im Speicher)
+    task_store_path: Optional[str] = None
+    # Multi-Tenant: Verzeichnis mit einer SQLite-Datei pro Konto (leer = nur im Speicher)
+    tenant_store_dir: Optional[str] = None
+
+    # Task-Snapshot-Cache (stale-while-revalidate)
+    task_cache_ttl: int = Field(
+        30, validation_alias=AliasChoices("TASK_CACHE_TTL_SEC", "TASK_CACHE_TTL")
+    )
+    task_cache_stale_ttl: int = Field(
+        120, validation_alias=AliasChoices("TASK_CACHE_STALE_SEC", "TASK_CACHE_STALE_TTL")
+    )
+    # Materialisiertes commander_dashboard: spätestens so oft auf neue Daten prüfen
+    dashboard_refresh_sec: int = 30
+
+    # Projekt- und Label-Index (Name → ID)
+    project_index_ttl: int = Field(
+        300, validation_alias=AliasChoices("PROJECT_INDEX_TTL_SEC", "PROJECT_INDEX_TTL")
+    )
+    label_index_ttl: int = Field(
+        300, validation_alias=AliasChoices("LABEL_INDEX_TTL_SEC", "LABEL_INDEX_TTL")
+    )
+
+    # Review-Sessions (review_batch → execute_review_response)
+    review_session_ttl: int = Field(
+        900, validation_alias=AliasChoices("REVIEW_SESSION_TTL_SEC", "REVIEW_SESSION_TTL")
+    )
+    review_session_max: int = 256
+
+    # Write-Behind: complete_task/update_task ins Journal (fsync), Antwort 202,
+    # Versand als Sync-Batch im Hintergrund; ein Journal pro Konto im Verzeichnis
+    write_behind: bool = False
+    write_journal_path: str = "write_journal"
+    write_behind_max_attempts: int = 10
+
+    # Keyword-Regeln für Label-Vorschläge (JSON, Default: core/label_rules.json)
+    label_rules_file: Optional[str] = None
+    scoring_backend: str = "auto"  # auto | numpy | python
+
+    # Antworten ab dieser Größe komprimieren (brotli falls installiert, sonst gzip)
+    compression_min_bytes: int = 1024
 
     # Eigene App
-    app_title: str = Field("Task Commander GPT", env="APP_TITLE")
+    app_title: str = "Task Commander GPT"
+    log_level: str = "INFO"
 
     # Basis‑URL für interne Aufrufe (lokal oder deployed)
-    service_base_url: str = Field(
-        "http://127.0.0.1:8000", env="SERVICE_BASE_URL"
-    )
+    service_base_url: str = "http://127.0.0.1:8000"
 
     class Config:
         env_file = ".env"
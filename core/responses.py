@@ -0,0 +1,97 @@
+# core/responses.py
+
+import functools
+import hashlib
+import inspect
+import json
+from typing import Any, Callable, Optional
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+try:
+    import orjson
+except ImportError:  # orjson ist optional, ohne wird die stdlib verwendet
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON als UTF-8-Bytes; unbekannte Typen laufen über jsonable_encoder."""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=jsonable_encoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """App-weite Response-Klasse: serialisiert über ``dumps`` (orjson, falls installiert)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _direct(endpoint: Callable, status_code: int) -> Callable:
+    def wrap(result):
+        if isinstance(result, (dict, list)):
+            return FastJSONResponse(result, status_code=status_code)
+        return result
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return wrap(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return wrap(endpoint(*args, **kwargs))
+    return wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route ohne jsonable_encoder für einfache Rückgaben: dict/list ohne
+    response_model werden direkt mit ``dumps`` gerendert. Der rekursive
+    Encoder kostet bei großen Task-Listen ein Vielfaches der Serialisierung.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        response_model = kwargs.get("response_model")
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = response_model.value
+        if response_model is None and "return" not in getattr(endpoint, "__annotations__", {}):
+            endpoint = _direct(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+
+
+# ── ETags ─────────────────────────────────────────────────────────────────────
+
+def etag_for(version: str, request: Request) -> str:
+    """Starker ETag aus Datenstand, Pfad und (sortierten) Query-Parametern."""
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(repr((version, request.url.path, query)).encode("utf-8"))
+    return f'"{digest.hexdigest()[:24]}"'
+
+
+def with_encoding(etag: str, encoding: Optional[str]) -> str:
+    """Komprimierte Varianten brauchen eigene starke ETags (``"<hash>-gzip"``)."""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def if_none_match(request: Request, etag: str) -> Optional[str]:
+    """Tag aus If-None-Match, falls der Client diesen Stand (in beliebiger Kodierung) hat."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return etag
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == etag.strip('"'):
+            return tag
+    return None
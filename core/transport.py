@@ -0,0 +1,115 @@
+# core/transport.py
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from core.config import AppConfig
+from core.metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 – HTTP/2 ist optional (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+TRANSPORT_EVENTS = REGISTRY.register(Counter(
+    "todoist_transport_events_total", "Warm-up und Keep-Alive-Pings zu Todoist", ("event", "result")
+))
+
+
+def create_client(config: AppConfig) -> httpx.AsyncClient:
+    """Gemeinsamer AsyncClient mit Pool-Grenzen, Keep-Alive und optional HTTP/2."""
+    http2 = config.http2
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning("HTTP2=true, aber das Paket h2 fehlt (httpx[http2]) – verwende HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_keepalive,
+            keepalive_expiry=config.http_keepalive_expiry,
+        ),
+        timeout=config.todoist_timeout,
+    )
+
+
+def upstream_origins(config: AppConfig) -> List[str]:
+    """Scheme + Host der Todoist-Endpunkte (REST und Sync teilen sich meist einen Pool)."""
+    origins = []
+    for url in (config.todoist_api_url, config.todoist_sync_url):
+        u = httpx.URL(url)
+        origin = f"{u.scheme}://{u.netloc.decode('ascii')}/"
+        if origin not in origins:
+            origins.append(origin)
+    return origins
+
+
+def pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[tuple, int]:
+    """Belegung des Verbindungspools; ``queued`` > 0 heißt: Pool ausgelastet."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return {}
+    connections = list(getattr(pool, "connections", []))
+    active = sum(1 for c in connections if not c.is_idle())
+    queued = sum(1 for r in list(getattr(pool, "_requests", [])) if r.is_queued())
+    return {
+        ("active",): active,
+        ("idle",): len(connections) - active,
+        ("max",): getattr(pool, "_max_connections", 0) or 0,
+        ("queued",): queued,
+    }
+
+
+class ConnectionKeeper:
+    """
+    Hält Verbindungen zu Todoist warm: beim Start werden ``connections``
+    Verbindungen pro Origin aufgebaut (DNS, TCP, TLS), danach erneuert ein
+    Ping im Abstand ``ping_interval`` (kleiner als keepalive_expiry) sie,
+    bevor der Pool sie als abgelaufen schließt. Pings sind HEAD-Requests ohne
+    Token auf die Origin und zählen nicht gegen das Todoist-Kontingent.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, config: AppConfig):
+        self.client = client
+        self.origins = upstream_origins(config)
+        # HTTP/2 multiplext alle Requests über eine Verbindung pro Origin
+        http2 = config.http2 and HTTP2_AVAILABLE
+        self.connections = min(1, config.http_warm_connections) if http2 else max(0, config.http_warm_connections)
+        self.ping_interval = config.http_ping_interval
+        self.timeout = config.todoist_timeout
+        self._task: Optional[asyncio.Task] = None
+
+    async def _touch(self, event: str) -> None:
+        async def head(origin: str) -> None:
+            try:
+                await self.client.head(origin, timeout=self.timeout)
+                TRANSPORT_EVENTS.inc(event, "ok")
+            except httpx.HTTPError as e:
+                TRANSPORT_EVENTS.inc(event, "error")
+                logger.debug("%s zu %s fehlgeschlagen: %s", event, origin, e)
+
+        # gleichzeitig, damit der Pool mehrere Verbindungen öffnet bzw. nutzt
+        await asyncio.gather(*(
+            head(origin) for origin in self.origins for _ in range(self.connections)
+        ))
+
+    async def run(self) -> None:
+        if self.connections == 0:
+            return
+        await self._touch("warmup")
+        while self.ping_interval > 0:
+            await asyncio.sleep(self.ping_interval)
+            await self._touch("ping")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
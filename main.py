@@ -1,29 +1,197 @@
-from fastapi import FastAPI
-from fastapi import Depends
-import httpx
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from starlette.middleware.gzip import GZipMiddleware
 from core.config import AppConfig
-from services.todoist import get_todoist_service, TodoistService
+from core.responses import FastJSONResponse, etag_for, if_none_match, with_encoding
+from core.transport import ConnectionKeeper, create_client, pool_stats
+from core.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, REGISTRY, Gauge
+from services.todoist import TodoistService, get_todoist_service
+from services.replica import TodoistReplica
+from services.scheduler import UpstreamScheduler
+from services.store import TaskStore, account_key
+from services.tenants import TenantRegistry
+from services.write_behind import journal_path
 from routers import tasks
 
+try:
+    from brotli_asgi import BrotliMiddleware  # optional, fällt selbst auf gzip zurück
+except ImportError:
+    BrotliMiddleware = None
+
 config = AppConfig()
-app = FastAPI(title=config.app_title)
+logging.basicConfig(
+    level=config.log_level.upper(),
+    format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s",
+)
+# httpx loggt jeden Request auf INFO → Upstream-Calls stehen in /metrics
+logging.getLogger("httpx").setLevel(logging.WARNING)
+app = FastAPI(title=config.app_title, default_response_class=FastJSONResponse)
 
 # Lifespan: erstelle/zerstöre den AsyncClient
 @app.on_event("startup")
 async def startup_event():
-    app.state.todoist_client = httpx.AsyncClient()
+    app.state.todoist_client = create_client(config)
+    # Verbindungen vorab aufbauen und per Ping warm halten
+    app.state.connection_keeper = ConnectionKeeper(app.state.todoist_client, config)
+    app.state.connection_keeper.start()
+    app.state.replica_task = None
+    app.state.task_store = None
+
+    if config.multi_tenant:
+        # Services entstehen pro Token beim ersten Request und teilen den Client
+        app.state.tenants = TenantRegistry(app.state.todoist_client, config)
+        return
+    if not config.todoist_token:
+        raise RuntimeError("TODOIST_TOKEN fehlt (oder MULTI_TENANT=true setzen)")
+
+    # Ein Scheduler für alle Todoist-Calls: gemeinsames Kontingent für Service und Replica
+    scheduler = UpstreamScheduler(app.state.todoist_client, config)
+
+    # Sync-Replica: einmal Bootstrap, danach nur Deltas im Hintergrund
+    replica = None
+    if config.replica_enabled:
+        if config.task_store_path:
+            app.state.task_store = TaskStore(
+                config.task_store_path, account=account_key(config.todoist_token)
+            )
+        replica = TodoistReplica(
+            client=app.state.todoist_client, config=config, scheduler=scheduler,
+            store=app.state.task_store
+        )
+
+    # Ein TodoistService pro Prozess: teilt Keep-Alive-Client, Cache und Replica
+    app.state.todoist_service = TodoistService(
+        client=app.state.todoist_client, config=config, replica=replica,
+        scheduler=scheduler, user_id=config.todoist_user_id,
+        journal_path=journal_path(
+            config.write_journal_path, account_key(config.todoist_token)
+        ) if config.write_behind else None,
+    )
+    if app.state.todoist_service.write_behind is not None:
+        # offene Operationen aus dem Journal weitersenden
+        app.state.todoist_service.write_behind.start()
+    if replica is not None:
+        app.state.replica_task = asyncio.create_task(
+            replica.run(on_change=app.state.todoist_service.on_replica_change)
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if getattr(app.state, "tenants", None) is not None:
+        app.state.tenants.close()
+    if getattr(app.state, "todoist_service", None) is not None:
+        app.state.todoist_service.close()
+    if app.state.replica_task:
+        app.state.replica_task.cancel()
+    if app.state.task_store is not None:
+        app.state.task_store.close()
+    app.state.connection_keeper.close()
     await app.state.todoist_client.aclose()
 
-# Dependency override: übergebe den AsyncClient aus state
-@app.on_event("startup")
-def override_todoist_dep():
-    from services.todoist import get_todoist_service
-    app.dependency_overrides[get_todoist_service] = lambda config=config: TodoistService(
-        client=app.state.todoist_client, config=config
-    )
+# ── Conditional GET und Kompression ───────────────────────────────────────────
+
+# Antworten dieser Routen hängen nur vom Task-Snapshot ab (get_tasks nur mit
+# filter; ohne wird Todoist live durchgereicht)
+SNAPSHOT_ROUTES = {
+    "/plan_tasks",
+    "/prioritized_tasks",
+    "/commander_dashboard",
+    "/focus_session",
+    "/task_diagnostics",
+    "/cleanup_recommendations",
+    "/label_recommendations",
+}
+
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=config.compression_min_bytes)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=config.compression_min_bytes)
+
+def _snapshot_route(request: Request) -> bool:
+    path = request.url.path
+    return path in SNAPSHOT_ROUTES or (path == "/get_tasks" and "filter" in request.query_params)
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    if request.method != "GET" or not _snapshot_route(request):
+        return await call_next(request)
+    try:
+        todoist = await get_todoist_service(request)
+    except HTTPException:
+        return await call_next(request)
+
+    # unveränderter Snapshot → 304, ohne den Endpoint auszuführen
+    before = todoist.read_version()
+    cached = if_none_match(request, etag_for(before, request)) if before is not None else None
+    if cached is not None:
+        return Response(
+            status_code=304,
+            headers={"ETag": cached, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"},
+        )
+
+    response = await call_next(request)
+    after = todoist.read_version()
+    # ändert sich der Stand während des Requests, ist unklar, welchen die Antwort zeigt
+    if response.status_code == 200 and after is not None and before in (None, after):
+        etag = etag_for(after, request)
+        response.headers["ETag"] = with_encoding(etag, response.headers.get("content-encoding"))
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# ── Metriken ──────────────────────────────────────────────────────────────────
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        # Route-Template statt Pfad, damit die Label-Anzahl begrenzt bleibt
+        route = request.scope.get("route")
+        path = getattr(route, "path", None)
+        if path is None:
+            # 304 aus conditional_get: Antwort vor dem Routing, Pfad ist das Template
+            path = request.url.path if _snapshot_route(request) else "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - started, request.method, path)
+        HTTP_REQUESTS.inc(request.method, path, status)
+
+def _pool_stats():
+    return pool_stats(getattr(app.state, "todoist_client", None))
+
+def _service_stats():
+    tenants = getattr(app.state, "tenants", None)
+    if tenants is not None:
+        return {
+            ("tenants",): len(tenants),
+            ("tenant_bytes_estimate",): tenants.estimated_bytes(),
+            ("tenant_evictions",): tenants.evictions,
+        }
+    service = getattr(app.state, "todoist_service", None)
+    if service is None:
+        return {}
+    stats = {("scheduler_queued",): service.scheduler.bucket.queued}
+    if service.write_behind is not None:
+        stats[("write_behind_pending",)] = service.write_behind.pending
+    for key, value in service.singleflight.stats.items():
+        stats[(f"singleflight_{key}",)] = value
+    return stats
+
+REGISTRY.register(Gauge(
+    "todoist_pool_connections", "Verbindungen im HTTP-Pool zu Todoist", ("state",), _pool_stats
+))
+REGISTRY.register(Gauge(
+    "todoist_service_state", "Warteschlange und Single-Flight des TodoistService", ("key",), _service_stats
+))
+
+@app.get("/metrics", summary="Prometheus metrics", include_in_schema=False)
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 # --- NEU: Init-Menü mit allen Core-Kommandos ---
 @app.get("/init_menu", summary="Returns the main Task Commander menu")
@@ -17,6 +17,9 @@ class AddTaskInput(BaseModel):
     due_string: Optional[str] = None
     duration_minutes: Optional[int] = None
 
+class BulkAddInput(BaseModel):
+    tasks: List[AddTaskInput]
+
 class UpdateTaskInput(BaseModel):
     task_id: str
     content: Optional[str] = None
@@ -30,5 +33,10 @@ class UpdateTaskInput(BaseModel):
 class QuickAddInput(BaseModel):
     content: str
 
+class ReviewResponseInput(BaseModel):
+    session_id: Optional[str] = None
+    response: str = ""
+    review_batch: Optional[List[dict]] = None  # Altformat ohne Session
+
 class AcceptLabelsInput(BaseModel):
     accept: List[str]  # Liste von task_ids
\ No newline at end of file
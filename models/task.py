@@ -0,0 +1,151 @@
+# models/task.py
+from sys import intern
+from typing import Optional, Tuple
+
+
+# Gemeinsam genutzte, unveränderliche Teilobjekte (Labels, Due) – begrenzt
+SHARED_MAX = 8192
+_shared: dict = {}
+
+
+def _intern(value):
+    return intern(value) if isinstance(value, str) else value
+
+
+def _share(key, build):
+    """Gleiche Werte nur einmal im Speicher halten (Labels-Tupel, Due-Dicts)."""
+    value = _shared.get(key)
+    if value is None:
+        if len(_shared) >= SHARED_MAX:
+            _shared.clear()
+        value = _shared[key] = build()
+    return value
+
+
+def _labels(labels) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    key = ("labels",) + tuple(labels)
+    return _share(key, lambda: (
+        tuple(intern(l) for l in labels),
+        tuple(intern(l.lower()) for l in labels),
+    ))
+
+
+def _due(due: Optional[dict]) -> Optional[dict]:
+    if not due:
+        return None
+    try:
+        key = ("due",) + tuple(sorted(due.items()))
+        hash(key)
+    except TypeError:  # unerwartete, nicht hashbare Werte → nicht teilen
+        return due
+    return _share(key, lambda: {k: _intern(v) for k, v in due.items()})
+
+
+class TaskRecord:
+    """
+    Kompakte Task für Snapshot, Replica und Analyse: feste Slots statt Dict,
+    wiederkehrende Strings (IDs von Projekten/Nutzern, Labels) interniert,
+    gleiche Label-Tupel und Due-Dicts geteilt (nicht verändern), Inhalt und
+    Labels bereits kleingeschrieben. In die öffentliche
+    REST-Form wird erst an der Response-Grenze mit ``to_dict`` gewandelt.
+    """
+
+    __slots__ = (
+        "id", "project_id", "section_id", "parent_id",
+        "content", "content_lower", "word_count", "description",
+        "is_completed", "labels", "labels_lower", "order", "priority",
+        "due", "duration_amount", "duration_unit",
+        "created_at", "creator_id", "assignee_id", "assigner_id",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        content: str = "",
+        project_id: Optional[str] = None,
+        section_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        description: str = "",
+        is_completed: bool = False,
+        labels: Tuple[str, ...] = (),
+        order: Optional[int] = None,
+        priority: int = 1,
+        due: Optional[dict] = None,
+        duration: Optional[dict] = None,
+        created_at: Optional[str] = None,
+        creator_id: Optional[str] = None,
+        assignee_id: Optional[str] = None,
+        assigner_id: Optional[str] = None,
+    ):
+        self.id = id
+        self.project_id = _intern(project_id)
+        self.section_id = _intern(section_id)
+        self.parent_id = parent_id
+        self.content = content
+        lower = content.lower() if isinstance(content, str) else ""
+        self.content_lower = content if lower == content else lower
+        self.word_count = len(self.content_lower.split())
+        self.description = description
+        self.is_completed = bool(is_completed)
+        self.labels, self.labels_lower = _labels(labels or ())
+        self.order = order
+        self.priority = priority
+        self.due = _due(due)
+        self.duration_amount = duration.get("amount") if duration else None
+        self.duration_unit = _intern(duration.get("unit")) if duration else None
+        self.created_at = created_at
+        self.creator_id = _intern(creator_id)
+        self.assignee_id = _intern(assignee_id)
+        self.assigner_id = _intern(assigner_id)
+
+    @classmethod
+    def from_dict(cls, t: dict) -> "TaskRecord":
+        """Aus einer Task im REST-v2-Format."""
+        return cls(
+            id=t["id"],
+            content=t.get("content", ""),
+            project_id=t.get("project_id"),
+            section_id=t.get("section_id"),
+            parent_id=t.get("parent_id"),
+            description=t.get("description", ""),
+            is_completed=t.get("is_completed", False),
+            labels=t.get("labels") or (),
+            order=t.get("order"),
+            priority=t.get("priority", 1),
+            due=t.get("due"),
+            duration=t.get("duration"),
+            created_at=t.get("created_at"),
+            creator_id=t.get("creator_id"),
+            assignee_id=t.get("assignee_id"),
+            assigner_id=t.get("assigner_id"),
+        )
+
+    @property
+    def duration(self) -> Optional[dict]:
+        if self.duration_amount is None:
+            return None
+        return {"amount": self.duration_amount, "unit": self.duration_unit}
+
+    def to_dict(self) -> dict:
+        """Öffentliche REST-v2-Form."""
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "section_id": self.section_id,
+            "parent_id": self.parent_id,
+            "content": self.content,
+            "description": self.description,
+            "is_completed": self.is_completed,
+            "labels": list(self.labels),
+            "order": self.order,
+            "priority": self.priority,
+            "due": self.due,
+            "duration": self.duration,
+            "created_at": self.created_at,
+            "creator_id": self.creator_id,
+            "assignee_id": self.assignee_id,
+            "assigner_id": self.assigner_id,
+        }
+
+    def __repr__(self) -> str:
+        return f"TaskRecord(id={self.id!r}, content={self.content!r})"
@@ -1,33 +1,74 @@
 # routers/tasks.py
 
-from datetime import datetime, timedelta
-from typing import List
-import requests
+from contextlib import contextmanager
+import logging
+from typing import AsyncIterator, List, Optional
+import httpx
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from core.responses import FastJSONResponse, FastJSONRoute, dumps
 
-from core.config import AppConfig
 from models.schemas import (
     AddTaskInput,
+    BulkAddInput,
     CompleteTaskInput,
     QuickAddInput,
+    ReviewResponseInput,
     UpdateTaskInput
 )
-from services.todoist import TodoistService, get_todoist_service
+from models.task import TaskRecord
+from services.planner import SCORING_LOGIC, TaskAnalysis
+from services.review import ReviewSession, parse_review_response
+from services.scheduler import retry_after_seconds
+from services.task_filter import parse_filter
+from services.todoist import (
+    TodoistService,
+    get_todoist_service,
+    item_add_command,
+    item_close_command,
+    item_update_commands,
+    sync_error
+)
+from services.write_behind import QueueClosed
+from utils.due_dates import resolve_due_date
 from utils.project_utils import resolve_project_id_by_name
 
-# ── Konfiguration ────────────────────────────────────────────────────────────
-
-config = AppConfig()
-BASE_URL = config.todoist_api_url
-HEADERS = {
-    "Authorization": f"Bearer {config.todoist_token}",
-    "Content-Type": "application/json"
-}
-TIMEOUT = config.todoist_timeout
-MY_USER_ID = "53165679"  # ← Deine echte ID aus /me
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=FastJSONRoute)
+
+def upstream_http_error(e: httpx.HTTPError, detail: str, status_code: int = 500) -> HTTPException:
+    """
+    HTTPException zu einem Fehler eines Todoist-Calls: 429 (mit Retry-After)
+    wird durchgereicht, 5xx → 502, Timeout/Deadline → 504, sonst ``status_code``.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code == 429:
+            retry_after = retry_after_seconds(e.response)
+            headers = {"Retry-After": str(round(retry_after))} if retry_after is not None else None
+            return HTTPException(
+                status_code=429, detail=f"{detail}: Todoist-Limit erreicht", headers=headers
+            )
+        if e.response.status_code >= 500:
+            return HTTPException(status_code=502, detail=f"{detail}: Todoist nicht verfügbar")
+    elif isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail=f"{detail}: Zeitüberschreitung")
+    return HTTPException(status_code=status_code, detail=detail)
+
+@contextmanager
+def upstream_errors(detail: str, status_code: int = 500):
+    """Übersetzt Fehler der Todoist-Calls in eine HTTPException mit eigener Meldung."""
+    try:
+        yield
+    except httpx.HTTPError as e:
+        raise upstream_http_error(e, detail, status_code)
 
-router = APIRouter()
+async def _analysis(todoist: TodoistService) -> TaskAnalysis:
+    with upstream_errors("Fehler beim Laden der Aufgaben"):
+        return await todoist.analysis(await todoist.current_user_id())
 
 # ── Initialization Menu ────────────────────────────────────────────────────────
 
@@ -47,46 +88,124 @@ def init_menu():
 
 # ── Endpoints ─────────────────────────────────────────────────────────────────
 
+def _project(task: dict, fields: Optional[list]) -> dict:
+    if fields is None:
+        return task
+    return {f: task.get(f) for f in fields}
+
+async def _as_dicts(records: List[TaskRecord]) -> AsyncIterator[dict]:
+    for t in records:
+        yield t.to_dict()
+
+async def _ndjson(first: dict, rest: AsyncIterator[dict], fields: Optional[list]):
+    yield dumps(_project(first, fields)) + b"\n"
+    try:
+        async for t in rest:
+            yield dumps(_project(t, fields)) + b"\n"
+    except httpx.HTTPError as e:
+        # Status ist bereits gesendet → Fehler als letzte Zeile melden
+        yield dumps({"error": f"Export abgebrochen: {e}"}) + b"\n"
+
 @router.get("/get_tasks")
-def get_tasks(limit: int = 50, offset: int = 0):
-    resp = requests.get(
-        f"{BASE_URL}/tasks?limit={limit}&offset={offset}",
-        headers=HEADERS,
-        timeout=TIMEOUT
+async def get_tasks(
+    limit: int = 50,
+    offset: int = 0,
+    format: str = "json",
+    fields: Optional[str] = None,
+    filter: Optional[str] = None,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format muss 'json' oder 'ndjson' sein")
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    matches = None
+    if filter:
+        try:
+            flt = parse_filter(filter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        with upstream_errors("Fehler beim Filtern der Aufgaben"):
+            matches = await todoist.filter_tasks(flt)
+
+    if format == "ndjson":
+        # Export aller (passenden) offenen Tasks, eine Zeile pro Task (limit/offset entfallen)
+        tasks = _as_dicts(matches) if matches is not None else todoist.iter_tasks()
+        with upstream_errors("Fehler beim Laden der Aufgaben"):
+            # erste Zeile vorab laden, damit Upstream-Fehler noch als HTTP-Status ankommen
+            try:
+                first = await tasks.__anext__()
+            except StopAsyncIteration:
+                return StreamingResponse(iter(()), media_type="application/x-ndjson")
+        return StreamingResponse(
+            _ndjson(first, tasks, selected), media_type="application/x-ndjson"
+        )
+
+    if matches is not None:
+        page = [t.to_dict() for t in matches[offset:offset + limit]]
+        return [_project(t, selected) for t in page] if selected else page
+
+    if selected:
+        with upstream_errors("Fehler beim Laden der Aufgaben"):
+            tasks = await todoist.get_tasks(limit, offset)
+        return [_project(t, selected) for t in tasks]
+
+    # Ohne Projektion: Upstream-Bytes unverändert durchreichen, ohne JSON zu parsen
+    with upstream_errors("Fehler beim Laden der Aufgaben"):
+        upstream = await todoist.stream_tasks(limit, offset)
+    return StreamingResponse(
+        upstream.aiter_bytes(),
+        media_type="application/json",
+        background=BackgroundTask(upstream.aclose),
     )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Laden der Aufgaben")
-    return resp.json()
 
 
-@router.post("/complete_task")
-def complete_task(data: CompleteTaskInput):
-    resp = requests.post(
-        f"{BASE_URL}/tasks/{data.task_id}/close",
-        headers=HEADERS,
-        timeout=TIMEOUT
+async def _write_behind(
+    todoist: TodoistService, kind: str, task_id: str, commands: List[dict], **extra
+) -> FastJSONResponse:
+    """Mutation ins Journal; 202 mit Operation-ID, Versand im Hintergrund."""
+    try:
+        op = await todoist.write_behind.submit(kind, task_id, commands)
+    except QueueClosed:
+        # Tenant wurde währenddessen verdrängt; Wiederholung landet beim neuen
+        raise HTTPException(
+            status_code=503, detail="Write-Behind-Queue geschlossen, bitte wiederholen",
+            headers={"Retry-After": "1"},
+        )
+    except OSError as e:
+        logger.error("Journal nicht beschreibbar: %s", e)
+        raise HTTPException(status_code=503, detail="Write-Journal nicht beschreibbar")
+    return FastJSONResponse(
+        {"status": "queued", "operation_id": op.id, "task_id": task_id, **extra},
+        status_code=202,
     )
-    if resp.status_code != 204:
-        raise HTTPException(status_code=500, detail="Fehler beim Abschließen der Aufgabe")
-    return {"status": "completed", "task_id": data.task_id}
 
 
-from datetime import datetime
-import dateparser
-from fastapi import HTTPException
+@router.post("/complete_task")
+async def complete_task(
+    data: CompleteTaskInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    if todoist.write_behind is not None:
+        return await _write_behind(
+            todoist, "complete_task", data.task_id, [item_close_command(data.task_id)]
+        )
+    with upstream_errors("Fehler beim Abschließen der Aufgabe"):
+        await todoist.close_task(data.task_id)
+    return {"status": "completed", "task_id": data.task_id}
+
 
 @router.post("/add_task")
-def add_task(data: AddTaskInput):
+async def add_task(
+    data: AddTaskInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
     project_id = data.project_id
 
     if not project_id and data.project_name:
         try:
-            project_id = resolve_project_id_by_name(
-                requests,
-                BASE_URL,
-                HEADERS,
-                data.project_name
-            )
+            with upstream_errors("Projekte konnten nicht geladen werden"):
+                project_id = await resolve_project_id_by_name(todoist, data.project_name)
         except ValueError as ve:
             raise HTTPException(status_code=400, detail=str(ve))
 
@@ -96,194 +215,184 @@ def add_task(data: AddTaskInput):
     }
 
     if data.duration_minutes and data.due_string:
-        due_date = dateparser.parse(data.due_string)
+        due_date = resolve_due_date(data.due_string)
         if not due_date:
             raise HTTPException(status_code=400, detail="Konnte Fälligkeitsdatum nicht interpretieren")
 
-        payload["due_date"] = due_date.date().isoformat()
+        payload["due_date"] = due_date.isoformat()
         payload["duration_minutes"] = data.duration_minutes
 
     elif data.due_string:
         payload["due_string"] = data.due_string
 
-    import json
-    print("📤 Payload an Todoist:")
-    print(json.dumps(payload, indent=2))
+    logger.debug("add_task payload=%s", payload)
 
-    resp = requests.post(
-        f"{BASE_URL}/tasks",
-        headers=HEADERS,
-        json=payload,
-        timeout=TIMEOUT
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Anlegen der Aufgabe")
-    return resp.json()
+    with upstream_errors("Fehler beim Anlegen der Aufgabe"):
+        return await todoist.add_task(payload)
 
 @router.post("/quick_add")
-def quick_add(data: QuickAddInput):
-    pr = requests.get(
-        f"{BASE_URL}/projects",
-        headers=HEADERS,
-        timeout=TIMEOUT
-    )
-    if pr.status_code != 200:
-        raise HTTPException(status_code=500, detail="Projekte konnten nicht geladen werden")
-
-    inbox = next((p for p in pr.json() if p["name"].lower() == "inbox"), None)
-    if not inbox:
+async def quick_add(
+    data: QuickAddInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    with upstream_errors("Projekte konnten nicht geladen werden"):
+        inbox_id = await todoist.projects.inbox_id()
+    if not inbox_id:
         raise HTTPException(status_code=500, detail="Inbox-Projekt nicht gefunden")
 
-    resp = requests.post(
-        f"{BASE_URL}/tasks",
-        headers=HEADERS,
-        json={"content": data.content, "project_id": inbox["id"]},
-        timeout=TIMEOUT
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Quick Add")
-    return resp.json()
+    with upstream_errors("Fehler beim Quick Add"):
+        return await todoist.add_task({"content": data.content, "project_id": inbox_id})
 
 
-@router.get("/plan_tasks")
-def get_tasks_needing_schedule():
-    resp = requests.get(
-        f"{BASE_URL}/tasks",
-        headers=HEADERS,
-        timeout=TIMEOUT
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Laden der Aufgaben")
-
-    tasks = resp.json()
-    unplanned = [
-        {
-            "id": t["id"],
-            "content": t["content"],
-            "project_id": t.get("project_id"),
-            "priority": t.get("priority"),
-            "created_at": t.get("created_at"),
-            "needs_scheduling": True
+@router.post("/bulk_add")
+async def bulk_add(
+    data: BulkAddInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    """
+    Viele Tasks auf einmal: Projekte und Fälligkeiten werden je Wert nur einmal
+    aufgelöst, angelegt wird gebündelt per item_add über die Sync API.
+    Ergebnis und Fehler pro Eintrag (Index in ``tasks``).
+    """
+    created, errors = [], {}
+    commands, pending = [], []  # (Index, Command)
+
+    names = {t.project_name for t in data.tasks if t.project_name and not t.project_id}
+    with upstream_errors("Projekte konnten nicht geladen werden"):
+        projects = {name: await todoist.projects.resolve(name) for name in names}
+
+    for i, item in enumerate(data.tasks):
+        fields = {"content": item.content, "project_id": item.project_id}
+        if not item.project_id and item.project_name:
+            fields["project_id"] = projects.get(item.project_name)
+            if not fields["project_id"]:
+                errors[str(i)] = f"Projekt '{item.project_name}' nicht gefunden"
+                continue
+
+        # wie add_task: mit Dauer braucht Todoist ein konkretes Datum
+        if item.duration_minutes and item.due_string:
+            due_date = resolve_due_date(item.due_string)
+            if not due_date:
+                errors[str(i)] = "Konnte Fälligkeitsdatum nicht interpretieren"
+                continue
+            fields["due_date"] = due_date.isoformat()
+            fields["duration_minutes"] = item.duration_minutes
+        elif item.due_string:
+            fields["due_string"] = item.due_string
+
+        cmd = item_add_command(fields)
+        commands.append(cmd)
+        pending.append((i, cmd))
+
+    status = await todoist.sync_commands(commands)
+    for i, cmd in pending:
+        err = sync_error(status["sync_status"].get(cmd["uuid"]))
+        task_id = status["temp_id_mapping"].get(cmd["temp_id"])
+        if err or not task_id:
+            errors[str(i)] = f"Todoist-Anlage fehlgeschlagen ({err or 'keine ID'})"
+        else:
+            created.append({"index": i, "id": task_id, "content": cmd["args"]["content"]})
+
+    return {
+        "created": created,
+        "errors": errors,
+        "summary": {
+            "total_created": len(created),
+            "total_failed": len(errors)
         }
-        for t in tasks if not t.get("due")
-    ]
+    }
+
+
+@router.get("/plan_tasks")
+async def get_tasks_needing_schedule(todoist: TodoistService = Depends(get_todoist_service)):
+    unplanned = (await _analysis(todoist)).unplanned
     return {"tasks": unplanned, "total": len(unplanned)}
 
 @router.patch("/update_task")
-def update_task(data: UpdateTaskInput):
-    headers = HEADERS.copy()
+async def update_task(
+    data: UpdateTaskInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
     payload = {}
 
     if data.project_id:
         payload["project_id"] = data.project_id
     elif data.project_name:
-        pr = requests.get("https://api.todoist.com/rest/v2/projects", headers=headers, timeout=5)
-        pr.raise_for_status()
-        m = next((p for p in pr.json() if p["name"].lower() == data.project_name.lower()), None)
-        if not m:
+        try:
+            with upstream_errors("Projekte konnten nicht geladen werden"):
+                payload["project_id"] = await resolve_project_id_by_name(todoist, data.project_name)
+        except ValueError:
             raise HTTPException(status_code=400, detail=f"Projekt '{data.project_name}' nicht gefunden")
-        payload["project_id"] = m["id"]
 
     for field in ("content", "due_string", "duration_minutes"):
         val = getattr(data, field)
         if val is not None:
             payload[field] = val
 
-    resp = requests.post(f"https://api.todoist.com/rest/v2/tasks/{data.task_id}", json=payload, headers=headers, timeout=5)
-    if resp.status_code not in (200, 204):
-        raise HTTPException(status_code=500, detail="Fehler beim Aktualisieren")
+    if todoist.write_behind is not None:
+        return await _write_behind(
+            todoist, "update_task", data.task_id,
+            item_update_commands(data.task_id, payload), **payload
+        )
+    with upstream_errors("Fehler beim Aktualisieren"):
+        await todoist.update_task(data.task_id, dict(payload))
     return {"status": "updated", **payload}
 
+@router.get("/operations/{operation_id}")
+async def get_operation(
+    operation_id: str,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    """Status einer Write-Behind-Operation (queued | sending | done | failed)."""
+    op = todoist.write_behind.get(operation_id) if todoist.write_behind is not None else None
+    if op is None:
+        raise HTTPException(status_code=404, detail="Operation nicht gefunden oder abgelaufen")
+    return op.to_dict()
+
 @router.post("/sync_update_labels")
 async def sync_update_labels(
     request: Request,
     todoist: TodoistService = Depends(get_todoist_service)
 ):
     body = await request.json()
-    print("🧾 Eingehender Payload:", body)
+    logger.debug("sync_update_labels body=%s", body)
 
     task_id = body.get("task_id")
     labels = body.get("labels")
-    print("🎯 Task-ID:", task_id)
-    print("🏷️ Labels:", labels)
 
     if not task_id or not isinstance(labels, list):
         raise HTTPException(status_code=400, detail="task_id und labels erforderlich")
 
     try:
-        result = await todoist.sync_update_labels(task_id, labels)
-        print("✅ Todoist Sync-Response:", result)
+        result = await todoist.sync_update_labels(
+            task_id, labels, create_missing=bool(body.get("create_missing"))
+        )
         return result
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise upstream_http_error(e, "Fehler beim Aktualisieren der Labels")
     except Exception as e:
-        print("❌ Fehler beim Todoist-Call:", e)
+        logger.exception("sync_update_labels fehlgeschlagen")
         raise HTTPException(status_code=500, detail=str(e))
 
 # — Jetzt keine weitere router-Zuweisung!
 
 @router.get("/get_projects")
-def get_projects():
-    resp = requests.get(f"{BASE_URL}/projects", headers=HEADERS, timeout=TIMEOUT)
-    resp.raise_for_status()
-    return {"projects": resp.json()}
+async def get_projects(todoist: TodoistService = Depends(get_todoist_service)):
+    # REST-v2-Form wie bisher; der Projekt-Index (ggf. aus der Replica) dient nur Lookups
+    with upstream_errors("Projekte konnten nicht geladen werden"):
+        return {"projects": await todoist.get_projects()}
 
 
 @router.get("/task_diagnostics")
-def task_diagnostics():
-    resp = requests.get(
-        f"{BASE_URL}/tasks",
-        headers=HEADERS,
-        timeout=TIMEOUT
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Laden der Aufgaben")
-
-    tasks = resp.json()
-    issues = []
-    for t in tasks:
-        if t.get("creator_id") != MY_USER_ID:
-            continue
-        raw_content = t.get("content", "")
-        content = raw_content.lower() if isinstance(raw_content, str) else ""
-        prio = t.get("priority", 1)
-        due = t.get("due")
-        labels = t.get("labels", [])
-        task_issues = []
-        suggested_label = None
-
-        if not due:
-            task_issues.append("missing_due")
-        if prio == 1:
-            task_issues.append("low_or_missing_priority")
-        if not t.get("project_id"):
-            task_issues.append("missing_project")
-        if not labels:
-            task_issues.append("missing_label")
-            if any(w in content for w in ["review", "bericht", "analyse", "reflexion", "tracker", "d&o"]):
-                suggested_label = "plan"
-            elif any(w in content for w in ["abschicken", "abgeben", "fertigstellen", "abschluss", "submit"]):
-                suggested_label = "deliver"
-            elif prio >= 3 and due:
-                suggested_label = "do"
-            elif any(w in content for w in ["call", "meeting", "besprechung", "termin", "abstimmung"]):
-                suggested_label = "social"
-            elif any(w in content for w in ["überweisen", "zahlung", "rechnung", "kosten", "versicherung", "miete"]):
-                suggested_label = "admin"
-            elif len(content.split()) <= 3:
-                suggested_label = "quick"
-            else:
-                suggested_label = "admin"
-
-        if task_issues:
-            issues.append({
-                "id": t["id"],
-                "content": raw_content,
-                "issues": task_issues,
-                "suggested_label": suggested_label
-            })
+async def task_diagnostics(todoist: TodoistService = Depends(get_todoist_service)):
+    analysis = await _analysis(todoist)
+    issues = analysis.diagnostics
 
     return {
         "diagnostics": issues,
-        "summary": {"total_checked": len(tasks), "with_issues": len(issues)},
+        "summary": {"total_checked": analysis.total_tasks, "with_issues": len(issues)},
         "action_tips": [
             "Setze due_string für planungsrelevante Aufgaben.",
             "Heb die Priorität für wichtige Aufgaben auf 3 oder 4 an.",
@@ -292,31 +401,14 @@ def task_diagnostics():
         ]
     }
 
-# oben im File dürfen SERVICE_URL bzw. BASE_URL weiter existieren, wir brauchen sie hier nicht mehr
+# Upstream-URLs und Header liegen im TodoistService, hier nur noch die Analyse-Logik
 
 @router.get("/cleanup_recommendations")
-def cleanup_recommendations():
-    # direkt task_diagnostics() aufrufen, statt HTTP-Request
-    diag = task_diagnostics()
-    diagnostics = diag["diagnostics"]
-    recommendations = []
-
-    for d in diagnostics:
-        missing = []
-        suggested_update = {}
-        if "missing_due" in d["issues"]:
-            suggested_update["due_string"] = "tomorrow"; missing.append("due")
-        if "low_or_missing_priority" in d["issues"]:
-            suggested_update["priority"] = 3; missing.append("priority")
-        if "missing_label" in d["issues"] and d.get("suggested_label"):
-            suggested_update["labels"] = [d["suggested_label"]]; missing.append("label")
-        if suggested_update:
-            recommendations.append({
-                "task_id": d["id"],
-                "content": d["content"],
-                "missing": missing,
-                "suggested_update": suggested_update
-            })
+async def cleanup_recommendations(todoist: TodoistService = Depends(get_todoist_service)):
+    # Diagnose und Cleanup stammen aus demselben Analyse-Durchlauf
+    analysis = await _analysis(todoist)
+    diagnostics = analysis.diagnostics
+    recommendations = analysis.cleanup
 
     return {
         "suggested_updates": recommendations,
@@ -329,11 +421,20 @@ def cleanup_recommendations():
 
 
 @router.get("/review_batch")
-def review_batch(size: int = 5):
-    # direkt cleanup_recommendations() aufrufen
-    batch = cleanup_recommendations()["suggested_updates"]
+async def review_batch(
+    size: int = 5,
+    session_id: Optional[str] = None,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    # Erster Aufruf legt eine Session an; Folge-Batches kommen aus der Session
+    if session_id:
+        session = _review_session(todoist, session_id)
+    else:
+        session = todoist.reviews.create((await _analysis(todoist)).cleanup)
     return {
-        "review_batch": batch[:size],
+        "session_id": session.id,
+        "review_batch": session.next_batch(size),
+        "remaining": session.remaining,
         "instruction": (
             "Antwortformat Beispiel:\n"
             "1 akzeptieren\n"
@@ -344,153 +445,104 @@ def review_batch(size: int = 5):
         )
     }
 
-import re
-
-# Stelle sicher, dass UpdateTaskInput oben importiert ist:
-# from routers.tasks import UpdateTaskInput, update_task
+def _review_session(todoist: TodoistService, session_id: str) -> ReviewSession:
+    session = todoist.reviews.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Review-Session unbekannt oder abgelaufen")
+    return session
 
 @router.post("/execute_review_response")
-def execute_review_response(data: dict):
-    batch = data.get("review_batch", [])
-    raw_response = data.get("response", "")
+async def execute_review_response(
+    data: ReviewResponseInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    # Nummern beziehen sich auf den zuletzt ausgelieferten Batch der Session
+    if data.session_id:
+        batch = _review_session(todoist, data.session_id).current
+    else:
+        batch = data.review_batch or []
+    raw_response = data.response
     if not batch or not raw_response:
-        raise HTTPException(status_code=400, detail="review_batch und response sind erforderlich")
+        raise HTTPException(status_code=400, detail="session_id und response sind erforderlich")
 
     executed, skipped, errors = [], [], {}
+    pending = []  # (Zeilennummer, task_id, payload, Sync-Commands)
 
-    for line in raw_response.strip().split("\n"):
-        m = re.match(r"^(\d+)(:| )\s*(.*)$", line.strip())
-        if not m:
-            continue
-        idx = int(m.group(1)) - 1
+    for action in parse_review_response(raw_response):
+        key = str(action.number)
+        idx = action.number - 1
         if not (0 <= idx < len(batch)):
-            errors[str(idx+1)] = "Index außerhalb des review_batch"
+            errors[key] = "Index außerhalb des review_batch"
             continue
 
         entry = batch[idx]
         task_id = entry["task_id"]
         suggestion = entry["suggested_update"]
-        user_input = m.group(3).strip().lower()
 
-        if user_input.startswith("skip"):
-            skipped.append(str(idx+1))
+        if action.kind == "skip":
+            skipped.append(key)
             continue
 
         payload = {"task_id": task_id}
 
-        if user_input.startswith("akzeptieren"):
+        if action.kind == "accept":
             payload.update(suggestion)
         else:
-            for f in re.split(r",\s*", user_input):
-                if f.startswith("prio"):
-                    prio_match = re.findall(r"\d+", f)
-                    if prio_match:
-                        payload["priority"] = int(prio_match[0])
-                    else:
-                        errors[str(idx+1)] = "Fehlende oder ungültige Priorität"
-                elif f.startswith("due"):
-                    ds = re.findall(r"\d{4}-\d{2}-\d{2}", f)
-                    payload["due_string"] = ds[0] if ds else f.replace("due", "").strip()
-                elif f.startswith("project"):
-                    parts = f.split(" ", 1)
-                    if len(parts) > 1:
-                        payload["project_name"] = parts[1].strip()
-                elif f.startswith("duration"):
-                    dur = re.findall(r"\d+", f)
-                    if dur:
-                        payload["duration_minutes"] = int(dur[0])
-                    else:
-                        errors[str(idx+1)] = "Fehlende oder ungültige Dauer"
+            payload.update(action.fields)
+            if action.error:
+                errors[key] = action.error
 
         if "duration_minutes" in suggestion:
             payload["duration_minutes"] = suggestion["duration_minutes"]
 
         try:
             inp = UpdateTaskInput(**payload)
-            update_task(inp)
-            executed.append({"task_id": task_id, "applied": payload})
+            fields = inp.model_dump(exclude_none=True)
+            if not inp.project_id and inp.project_name:
+                with upstream_errors("Projekte konnten nicht geladen werden"):
+                    fields["project_id"] = await resolve_project_id_by_name(todoist, inp.project_name)
+            commands = item_update_commands(task_id, fields)
         except HTTPException as he:
-            errors[str(idx+1)] = f"Update fehlgeschlagen: {he.detail}"
+            errors[key] = f"Update fehlgeschlagen: {he.detail}"
+            continue
         except Exception as e:
-            errors[str(idx+1)] = f"Fehler: {e}"
+            errors[key] = f"Fehler: {e}"
+            continue
 
-    return {"executed": executed, "skipped": skipped, "errors": errors}
+        if commands:
+            pending.append((key, task_id, payload, commands))
+        else:
+            executed.append({"task_id": task_id, "applied": payload})
 
-@router.get("/focus_session")
-def focus_session(limit: int = 3):
-    try:
-        resp = requests.get(f"{BASE_URL}/tasks", headers=HEADERS, timeout=TIMEOUT)
-        resp.raise_for_status()
-        tasks = resp.json()
-
-        filtered = []
-        for t in tasks:
-            # nur offene Tasks mit Fälligkeitsdatum und hoher Priorität
-            if t.get("is_completed") or not t.get("due") or t.get("priority", 1) < 3:
-                continue
+    # Alle Updates gesammelt als Sync-Commands (max. 100 pro Request)
+    status = await todoist.sync_commands([c for *_, cmds in pending for c in cmds])
+    for key, task_id, payload, commands in pending:
+        failed = [e for e in (sync_error(status["sync_status"].get(c["uuid"])) for c in commands) if e]
+        if failed:
+            errors[key] = f"Update fehlgeschlagen: {'; '.join(failed)}"
+        else:
+            executed.append({"task_id": task_id, "applied": payload})
 
-            dur_obj = t.get("duration") or {}
-            duration = dur_obj.get("amount", 0)
+    return {"executed": executed, "skipped": skipped, "errors": errors}
 
-            # Dauer ≤ 60 Minuten
-            if duration > 60:
-                continue
+@router.get("/focus_session")
+async def focus_session(
+    limit: int = 3,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    # offene Tasks mit Fälligkeitsdatum, Priorität ≥ 3 und Dauer ≤ 60 Min,
+    # sortiert nach Priorität, dann Fälligkeitsdatum
+    analysis = await _analysis(todoist)
 
-            labels = [l.lower() for l in t.get("labels", [])]
-            filtered.append({
-                "id": t["id"],
-                "content": t["content"],
-                "due": t["due"],
-                "priority": t.get("priority", 1),
-                "duration": duration,
-                "labels": labels,
-                "focus": any(x in labels for x in ["do", "deliver", "deep"])
-            })
-
-        # Sortierung: höhere Priorität zuerst, dann Fälligkeitsdatum
-        filtered.sort(key=lambda x: (-x["priority"], x["due"]["date"]))
-
-        return {
-            "focus_tasks": filtered[:limit],
-            "total_found": len(filtered),
-            "logic": "Priorität ≥ 3, due vorhanden, Dauer ≤ 60 Min, Fokus-Labels optional"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"focus_session-Fehler: {e}")
+    return {
+        "focus_tasks": analysis.top_focus(limit),
+        "total_found": len(analysis.focus_candidates),
+        "logic": "Priorität ≥ 3, due vorhanden, Dauer ≤ 60 Min, Fokus-Labels optional"
+    }
 
 @router.get("/label_recommendations")
-def label_recommendations():
-    resp = requests.get(f"{BASE_URL}/tasks", headers=HEADERS, timeout=TIMEOUT)
-    if resp.status_code != 200:
-        raise HTTPException(500, "Fehler beim Laden der Aufgaben von Todoist")
-
-    suggestions = []
-    for t in resp.json():
-        if t.get("labels"):
-            continue
-
-        content = t.get("content", "").lower()
-        prio    = t.get("priority", 1)
-        due     = t.get("due")
-
-        if any(w in content for w in ["review", "plan", "entwurf", "konzept", "strategie"]):
-            lbl = "plan"
-        elif any(w in content for w in ["abschicken", "finalisieren", "abgeben", "fertigstellen"]):
-            lbl = "deliver"
-        elif prio >= 3 and due:
-            lbl = "do"
-        elif any(w in content for w in ["call", "meeting", "besprechen", "termin"]):
-            lbl = "social"
-        elif len(content.split()) <= 3:
-            lbl = "quick"
-        else:
-            lbl = "admin"
-
-        suggestions.append({
-            "task_id": t["id"],
-            "content": t["content"],
-            "suggested_label": lbl
-        })
+async def label_recommendations(todoist: TodoistService = Depends(get_todoist_service)):
+    suggestions = (await _analysis(todoist)).label_suggestions
 
     return {
         "recommendations": suggestions,
@@ -506,21 +558,26 @@ def label_recommendations():
 from models.schemas import AcceptLabelsInput
 
 @router.post("/accept_label_recommendations")
-def accept_label_recommendations(data: AcceptLabelsInput):
+async def accept_label_recommendations(
+    data: AcceptLabelsInput,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
     # 1) Hole die Vorschläge direkt aus der Funktion
-    rec = label_recommendations()
+    rec = await label_recommendations(todoist)
     suggestions = rec["recommendations"]
 
-    # 2) Lade alle Label-IDs von Todoist
-    label_resp = requests.get(f"{BASE_URL}/labels", headers=HEADERS, timeout=TIMEOUT)
-    if label_resp.status_code != 200:
-        raise HTTPException(500, "Labels konnten nicht geladen werden")
-    label_map = {l["name"].strip().lower(): l["id"] for l in label_resp.json()}
-
-    # 3) Bestimme, welche IDs akzeptiert wurden
+    # 2) Bestimme, welche IDs akzeptiert wurden
     accepted_ids = set(data.accept)
 
+    # 3) Labels aus dem Index auflösen, fehlende gesammelt anlegen
+    with upstream_errors("Labels konnten nicht geladen werden"):
+        label_map = await todoist.labels.resolve(
+            {s["suggested_label"] for s in suggestions if s["task_id"] in accepted_ids},
+            create_missing=True
+        )
+
     executed, skipped, errors = [], [], {}
+    commands, pending = [], []
 
     # 4) Für jede Empfehlung
     for s in suggestions:
@@ -530,31 +587,23 @@ def accept_label_recommendations(data: AcceptLabelsInput):
             continue
 
         lbl = s["suggested_label"].strip().lower()
-        lid = label_map.get(lbl)
-        if not lid:
+        label = label_map.get(lbl)
+        if not label:
             errors[tid] = f"Label '{lbl}' nicht gefunden"
             continue
 
-        payload = {"task_id": tid, "labels": [lid]}
+        cmd = item_update_commands(tid, {"labels": [label["name"]]})[0]
+        commands.append(cmd)
+        pending.append((tid, lbl, cmd["uuid"]))
 
-        # 5) Update entweder lokal oder direkt gegen Todoist
-        try:
-            # Variante A: lokale Funktion (wenn Du update_task importiert hast)
-            # update_task(UpdateTaskInput(task_id=tid, labels=[lid]))
-            #
-            # Variante B: direkte API
-            r = requests.post(
-                f"{BASE_URL}/tasks/{tid}",
-                headers=HEADERS,
-                json=payload,
-                timeout=TIMEOUT
-            )
-            if r.status_code not in (200, 204):
-                errors[tid] = f"Todoist-Update fehlgeschlagen ({r.status_code})"
-            else:
-                executed.append({"task_id": tid, "label": lbl})
-        except Exception as e:
-            errors[tid] = str(e)
+    # 5) Alle Label-Updates gebündelt über die Sync API
+    status = await todoist.sync_commands(commands)
+    for tid, lbl, cmd_uuid in pending:
+        err = sync_error(status["sync_status"].get(cmd_uuid))
+        if err:
+            errors[tid] = f"Todoist-Update fehlgeschlagen ({err})"
+        else:
+            executed.append({"task_id": tid, "label": lbl})
 
     return {
         "executed": executed,
@@ -568,94 +617,28 @@ def accept_label_recommendations(data: AcceptLabelsInput):
     }
 
 @router.get("/me")
-def get_me():
-    return {"user_id": MY_USER_ID}
+async def get_me(todoist: TodoistService = Depends(get_todoist_service)):
+    with upstream_errors("Nutzer konnte nicht ermittelt werden"):
+        return {"user_id": await todoist.current_user_id()}
 
 
 @router.get("/prioritized_tasks")
-def prioritized_tasks(limit: int = 5):
-    resp = requests.get(
-        f"{BASE_URL}/tasks",
-        headers=HEADERS,
-        timeout=TIMEOUT
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Fehler beim Laden der Aufgaben")
-
-    now = datetime.utcnow()
-    today = now.date()
-    tasks = resp.json()
-    scored = []
-    for t in tasks:
-        if t.get("is_completed") or t.get("creator_id") != MY_USER_ID:
-            continue
-        content = t.get("content", "").lower()
-        labels = [l.lower() for l in t.get("labels", [])]
-        prio = t.get("priority", 1)
-        due = t.get("due")
-        wc = len(content.split())
-        score = 0
-        reason = []
-        is_today = False
-
-        if any(l in labels for l in ["do", "deliver"]):
-            score += 3; reason.append("impact")
-        if due and "date" in due:
-            try:
-                dd = datetime.fromisoformat(due["date"]).date()
-                if dd == today:
-                    score += 3; reason.append("due today"); is_today = True
-                elif dd <= today + timedelta(days=3):
-                    score += 2; reason.append("due < 3d")
-            except:
-                reason.append("due parse error")
-        else:
-            reason.append("no due")
-        if not is_today and any(x in content for x in ["staubsaugen","fenster","pool","kinder","privat","putzen"]):
-            score -= 2; reason.append("private")
-        if prio == 4:
-            score += 2; reason.append("prio 4")
-        if wc <= 3:
-            score += 1; reason.append("quick")
-
-        scored.append({
-            "id": t["id"],
-            "content": t.get("content"),
-            "score": score,
-            "priority": prio,
-            "due": due,
-            "labels": labels,
-            "reason": reason
-        })
-
-    scored.sort(key=lambda x: -x["score"])
+async def prioritized_tasks(
+    limit: int = 5,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    analysis = await _analysis(todoist)
     return {
-        "prioritized": scored[:limit],
-        "total_eligible": len(scored),
-        "scoring_logic": "impact +3, due today +3, due<3d +2, prio 4 +2, quick +1, private -2 (wenn nicht today)"
+        "prioritized": analysis.top_prioritized(limit),
+        "total_eligible": analysis.total_eligible,
+        "scoring_logic": SCORING_LOGIC
     }
 
-from fastapi import HTTPException
-from datetime import datetime
-
 @router.get("/commander_dashboard")
-def commander_dashboard(limit: int = 5):
-    try:
-        # direkt auf unsere internen Funktionen zugreifen
-        top_tasks    = prioritized_tasks(limit)["prioritized"]
-        review_needs = review_batch(limit)["review_batch"]
-        unplanned    = get_tasks_needing_schedule()["tasks"]
-
-        return {
-            "date": datetime.utcnow().date().isoformat(),
-            "top_tasks": top_tasks,
-            "review_needs": review_needs,
-            "unplanned_tasks": unplanned,
-            "slot_suggestions": {
-                "deep_work":   [t["content"] for t in top_tasks if "plan" in t.get("labels", []) or t["score"] >= 6],
-                "quick_wins":  [t["content"] for t in top_tasks if "quick" in t.get("reason", []) or t["score"] <= 4],
-                "today_focus": [t["content"] for t in top_tasks if "due today" in t.get("reason", [])]
-            }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Commander-Dashboard Fehler: {e}")
\ No newline at end of file
+async def commander_dashboard(
+    limit: int = 5,
+    todoist: TodoistService = Depends(get_todoist_service)
+):
+    # vorberechnet je limit; neu gebaut bei geänderten Daten oder neuem Tag
+    with upstream_errors("Fehler beim Laden der Aufgaben"):
+        return await todoist.dashboard.get(limit)
\ No newline at end of file
@@ -0,0 +1,132 @@
+# services/cache.py
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from core.metrics import CACHE_REQUESTS
+from core.responses import dumps
+from models.task import TaskRecord
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_fingerprint(tasks: List[TaskRecord]) -> str:
+    """Hash über Inhalt und Reihenfolge des Snapshots (gleiche Daten → gleicher Wert)."""
+    h = hashlib.blake2b(digest_size=12)
+    for t in tasks:
+        h.update(dumps(t.to_dict()))
+    return h.hexdigest()
+
+
+class TaskSnapshotCache:
+    """
+    Prozessweiter Snapshot der Todoist-Taskliste.
+
+    - frisch (Alter < ttl): Snapshot wird direkt geliefert
+    - stale (Alter < ttl + stale_ttl): Snapshot wird geliefert, im Hintergrund
+      wird einmalig neu geladen (stale-while-revalidate)
+    - älter bzw. invalidiert: blockierender Reload, parallele Aufrufer teilen
+      sich denselben Upstream-Call
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[TaskRecord]]],
+        ttl: float,
+        stale_ttl: float,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._on_change = on_change
+
+        self._load_lock = asyncio.Lock()
+        self._tasks: Optional[List[TaskRecord]] = None
+        self._fetched_at = 0.0
+        self._generation = 0  # verwirft Ladeergebnisse von vor einer Invalidierung
+        self._version: Optional[str] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._last: Optional[List[TaskRecord]] = None  # bleibt über invalidate erhalten
+
+    @property
+    def version(self) -> Optional[str]:
+        """Fingerprint des zuletzt geladenen Snapshots; Reload mit gleichen Daten ändert ihn nicht."""
+        return self._version
+
+    def peek(self) -> Optional[List[TaskRecord]]:
+        """Aktueller Snapshot ohne Laden (None, wenn keiner vorliegt)."""
+        return self._tasks
+
+    def current_version(self) -> Optional[str]:
+        """
+        Version des Snapshots, den ``get`` jetzt ohne blockierendes Laden
+        liefern würde, sonst None. Im stale-Fenster wird wie bei ``get`` im
+        Hintergrund neu geladen.
+        """
+        if self._tasks is None:
+            return None
+        age = time.monotonic() - self._fetched_at
+        if age < self.ttl:
+            return self._version
+        if age < self.ttl + self.stale_ttl:
+            self._start_revalidate()
+            return self._version
+        return None
+
+    def _start_revalidate(self) -> None:
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._revalidate(self._generation))
+
+    async def get(self) -> List[TaskRecord]:
+        tasks = self._tasks
+        if tasks is not None:
+            age = time.monotonic() - self._fetched_at
+            if age < self.ttl:
+                CACHE_REQUESTS.inc("task_snapshot", "hit")
+                return tasks
+            if age < self.ttl + self.stale_ttl:
+                CACHE_REQUESTS.inc("task_snapshot", "stale")
+                self._start_revalidate()
+                return tasks
+
+        CACHE_REQUESTS.inc("task_snapshot", "miss")
+        async with self._load_lock:
+            # Ein anderer Aufrufer kann inzwischen geladen haben
+            if self._tasks is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return self._tasks
+            generation = self._generation
+            tasks = await self._loader()
+            self._store(tasks, generation)
+            return tasks
+
+    def invalidate(self) -> None:
+        """Nach Schreibzugriffen: nächster Lesezugriff lädt blockierend neu."""
+        self._tasks = None
+        self._fetched_at = 0.0
+        self._generation += 1
+
+    def _store(self, tasks: List[TaskRecord], generation: int) -> None:
+        # Ergebnis verwerfen, wenn zwischenzeitlich invalidiert wurde
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self._fetched_at = time.monotonic()
+        version = snapshot_fingerprint(tasks)
+        if version == self._version and self._last is not None:
+            # unverändert: bisherige Liste behalten, abgeleitete Caches bleiben gültig
+            self._tasks = self._last
+            return
+        self._tasks = self._last = tasks
+        self._version = version
+        if self._on_change is not None:
+            self._on_change()
+
+    async def _revalidate(self, generation: int) -> None:
+        try:
+            self._store(await self._loader(), generation)
+        except Exception as e:
+            logger.warning("Hintergrund-Refresh des Task-Snapshots fehlgeschlagen: %s", e)
@@ -0,0 +1,138 @@
+# services/dashboard.py
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from core.metrics import CACHE_REQUESTS
+from services.planner import TaskAnalysis, slot_suggestions
+
+logger = logging.getLogger(__name__)
+
+# Anzahl vorgehaltener limit-Varianten (LRU)
+MAX_VIEWS = 16
+
+# Ohne Leser stellt der Hintergrund-Loop nach dieser Zeit die Arbeit ein
+IDLE_SEC = 600
+
+
+def build_dashboard(analysis: TaskAnalysis, limit: int, generated_at: str) -> dict:
+    top_tasks = analysis.top_prioritized(limit)
+    return {
+        "date": analysis.day.isoformat(),
+        "generated_at": generated_at,
+        "top_tasks": top_tasks,
+        "review_needs": analysis.cleanup[:limit],
+        "unplanned_tasks": analysis.unplanned,
+        "slot_suggestions": slot_suggestions(top_tasks)
+    }
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.utcnow()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+class MaterializedDashboard:
+    """
+    Vorberechnete commander_dashboard-Antworten je ``limit``. Ein
+    Hintergrund-Loop baut sie neu, wenn sich die Analyse ändert (neuer
+    Snapshot, Schreibzugriff, Replica-Delta) oder der Tag wechselt –
+    höchstens einmal pro ``interval``, Schreibserien lösen also nicht je
+    einen Neubau aus. Leser bekommen das fertige Dict; ist es veraltet,
+    wartet der Leser auf die (gemeinsame) Neuberechnung.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[TaskAnalysis]], interval: float):
+        self._load = load
+        self.interval = interval
+
+        self._views: "OrderedDict[int, dict]" = OrderedDict()
+        self._source: Optional[TaskAnalysis] = None
+        self._generated_at = ""
+        self._dirty = True
+        self._wake = asyncio.Event()
+        self._pending: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.Task] = None
+        self._last_read = 0.0
+        self._built_at = 0.0
+
+    def invalidate(self) -> None:
+        """Daten haben sich geändert: nächster Leser wartet auf den Neubau."""
+        self._dirty = True
+        self._wake.set()
+
+    def _current(self) -> bool:
+        return (
+            not self._dirty
+            and self._source is not None
+            and self._source.day == datetime.utcnow().date()
+        )
+
+    async def get(self, limit: int) -> dict:
+        self._last_read = time.monotonic()
+        if self._loop is None or self._loop.done():
+            self._loop = asyncio.create_task(self._run())
+
+        if not self._current():
+            await self.refresh()
+        view = self._views.get(limit)
+        if view is not None:
+            CACHE_REQUESTS.inc("dashboard", "hit")
+            self._views.move_to_end(limit)
+        else:
+            CACHE_REQUESTS.inc("dashboard", "miss")
+            view = self._views[limit] = build_dashboard(self._source, limit, self._generated_at)
+            while len(self._views) > MAX_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+    async def refresh(self) -> None:
+        """Gemeinsame Neuberechnung für alle Wartenden."""
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.create_task(self._rebuild())
+        await asyncio.shield(self._pending)
+
+    async def _rebuild(self) -> None:
+        # vor dem Laden zurücksetzen: Invalidierungen währenddessen bleiben sichtbar
+        self._dirty = False
+        self._built_at = time.monotonic()
+        try:
+            analysis = await self._load()
+        except Exception:
+            self._dirty = True
+            raise
+        if analysis is self._source:
+            return  # Analyse unverändert → Sichten bleiben gültig
+        self._source = analysis
+        self._generated_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        self._views = OrderedDict(
+            (limit, build_dashboard(analysis, limit, self._generated_at))
+            for limit in self._views
+        )
+
+    async def _run(self) -> None:
+        while time.monotonic() - self._last_read < IDLE_SEC:
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), timeout=min(self.interval, _seconds_to_midnight() + 1)
+                )
+            except asyncio.TimeoutError:
+                pass
+            # Invalidierungen bündeln: frühestens interval nach dem letzten Neubau
+            await asyncio.sleep(self._built_at + self.interval - time.monotonic())
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Dashboard-Neuberechnung fehlgeschlagen: %s", e)
+
+    def close(self) -> None:
+        if self._loop is not None:
+            self._loop.cancel()
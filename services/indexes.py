@@ -0,0 +1,151 @@
+# services/indexes.py
+
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from core.metrics import CACHE_REQUESTS
+
+# Bei unbekanntem Namen frühestens nach so vielen Sekunden erneut laden
+MISS_REFRESH_SEC = 10
+
+
+class _NameIndex:
+    """Gemeinsame Basis: Liste von Objekten mit ``name``, vorab kleingeschrieben indiziert."""
+
+    metric_name = "name_index"
+
+    def __init__(self, loader: Callable[[], Awaitable[List[dict]]], ttl: float):
+        self._loader = loader
+        self.ttl = ttl
+
+        self._lock = asyncio.Lock()
+        self._entries: List[dict] = []
+        self._by_name: Dict[str, dict] = {}
+        self._fetched_at: Optional[float] = None
+
+    def _fresh(self) -> bool:
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def invalidate(self) -> None:
+        self._fetched_at = None
+
+    def _build(self, entries: List[dict]) -> None:
+        self._entries = entries
+        self._by_name = {e["name"].strip().lower(): e for e in entries}
+
+    async def refresh(self, force: bool = True) -> None:
+        async with self._lock:
+            # Parallele Aufrufer: nur einer lädt, die anderen nutzen das Ergebnis
+            if not force and self._fresh():
+                return
+            self._build(await self._loader())
+            self._fetched_at = time.monotonic()
+
+    async def _ensure(self) -> None:
+        if self._fresh():
+            CACHE_REQUESTS.inc(self.metric_name, "hit")
+            return
+        CACHE_REQUESTS.inc(self.metric_name, "miss")
+        await self.refresh(force=False)
+
+    def _may_retry_miss(self) -> bool:
+        return time.monotonic() - self._fetched_at > MISS_REFRESH_SEC
+
+    async def all(self) -> List[dict]:
+        await self._ensure()
+        return self._entries
+
+    async def lookup(self, name: str) -> Optional[dict]:
+        """Eintrag zum Namen (case-insensitive); bei Fehlschlag einmal neu laden."""
+        await self._ensure()
+        match = self._by_name.get(name.strip().lower())
+        if match is None and self._may_retry_miss():
+            # Evtl. gerade erst angelegt → einmal frisch laden
+            await self.refresh()
+            match = self._by_name.get(name.strip().lower())
+        return match
+
+
+class ProjectIndex(_NameIndex):
+    """
+    Projektname → Projekt, vorab kleingeschrieben, mit TTL und Invalidierung.
+    Die Inbox-ID wird einmal über das Flag ``is_inbox_project`` bestimmt.
+    """
+
+    metric_name = "project_index"
+
+    def __init__(self, loader: Callable[[], Awaitable[List[dict]]], ttl: float):
+        super().__init__(loader, ttl)
+        self._inbox_id: Optional[str] = None
+
+    def _build(self, entries: List[dict]) -> None:
+        super()._build(entries)
+        self._inbox_id = next(
+            (p["id"] for p in entries if p.get("is_inbox_project")),
+            None,
+        )
+
+    async def resolve(self, name: str) -> Optional[str]:
+        match = await self.lookup(name)
+        return match["id"] if match else None
+
+    async def inbox_id(self) -> Optional[str]:
+        await self._ensure()
+        if self._inbox_id is None:
+            inbox = self._by_name.get("inbox")
+            return inbox["id"] if inbox else None
+        return self._inbox_id
+
+
+class LabelIndex(_NameIndex):
+    """
+    Labelname → Label mit TTL und Invalidierung. Fehlende Labels können
+    gesammelt in einem Sync-Request (``label_add`` mit temp_id) angelegt werden.
+    """
+
+    metric_name = "label_index"
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[dict]]],
+        ttl: float,
+        sync: Callable[[List[dict]], Awaitable[dict]],
+    ):
+        super().__init__(loader, ttl)
+        self._sync = sync
+
+    async def resolve(
+        self, names: Iterable[str], create_missing: bool = False
+    ) -> Dict[str, Optional[dict]]:
+        """
+        Kleingeschriebener Name → Label (None, wenn nicht vorhanden bzw. nicht
+        anlegbar). Mit ``create_missing`` werden fehlende Labels angelegt.
+        """
+        await self._ensure()
+        wanted = {n.strip().lower(): n.strip() for n in names if n and n.strip()}
+        result = {key: self._by_name.get(key) for key in wanted}
+
+        missing = [key for key, label in result.items() if label is None]
+        if missing and self._may_retry_miss():
+            await self.refresh()
+            result = {key: self._by_name.get(key) for key in wanted}
+            missing = [key for key, label in result.items() if label is None]
+
+        if missing and create_missing:
+            commands = [{
+                "type": "label_add",
+                "uuid": str(uuid.uuid4()),
+                "temp_id": str(uuid.uuid4()),
+                "args": {"name": wanted[key]},
+            } for key in missing]
+            status = await self._sync(commands)
+            for key, cmd in zip(missing, commands):
+                label_id = status["temp_id_mapping"].get(cmd["temp_id"])
+                if status["sync_status"].get(cmd["uuid"]) == "ok" and label_id:
+                    label = {"id": label_id, "name": wanted[key]}
+                    self._entries.append(label)
+                    self._by_name[key] = label
+                    result[key] = label
+        return result
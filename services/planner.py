@@ -0,0 +1,311 @@
+# services/planner.py
+
+import heapq
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List
+
+from models.task import TaskRecord
+from services.rules import LabelRules
+
+try:
+    import numpy as np
+except ImportError:  # NumPy ist optional, ohne wird in Python gerechnet
+    np = None
+
+# ── Label-Gruppen ─────────────────────────────────────────────────────────────
+
+IMPACT_LABELS = ["do", "deliver"]
+FOCUS_LABELS = ["do", "deliver", "deep"]
+
+SCORING_LOGIC = "impact +3, due today +3, due<3d +2, prio 4 +2, quick +1, private -2 (wenn nicht today)"
+
+# Spalte "due": Ordinalzahl des Datums, sonst einer dieser Marker
+NO_DUE = -1
+DUE_PARSE_ERROR = -2
+
+# Spalte "flags": Bitmaske je Task
+IMPACT = 1
+PRIVATE = 2
+
+# Ab dieser Anzahl lohnt sich NumPy im Modus "auto"
+NUMPY_MIN_ROWS = 512
+
+
+@dataclass
+class ScoreColumns:
+    """Spaltenweise Scoring-Eingaben der eigenen, offenen Tasks (eine Zeile pro Task)."""
+    tasks: List[TaskRecord] = field(default_factory=list)
+    priority: List[int] = field(default_factory=list)
+    due: List[int] = field(default_factory=list)
+    flags: List[int] = field(default_factory=list)
+    words: List[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+def _scores_python(cols: ScoreColumns, today: int) -> List[int]:
+    scores = []
+    for prio, due, flags, wc in zip(cols.priority, cols.due, cols.flags, cols.words):
+        score = 3 if flags & IMPACT else 0
+        is_today = due == today
+        if is_today:
+            score += 3
+        elif 0 < due <= today + 3:
+            score += 2
+        if flags & PRIVATE and not is_today:
+            score -= 2
+        if prio == 4:
+            score += 2
+        if wc <= 3:
+            score += 1
+        scores.append(score)
+    return scores
+
+
+def _scores_numpy(cols: ScoreColumns, today: int):
+    prio = np.asarray(cols.priority, dtype=np.int64)
+    due = np.asarray(cols.due, dtype=np.int64)
+    flags = np.asarray(cols.flags, dtype=np.int64)
+    words = np.asarray(cols.words, dtype=np.int64)
+
+    is_today = due == today
+    soon = (due > 0) & ~is_today & (due <= today + 3)
+    private = ((flags & PRIVATE) != 0) & ~is_today
+    return (
+        3 * ((flags & IMPACT) != 0)
+        + 3 * is_today
+        + 2 * soon
+        - 2 * private
+        + 2 * (prio == 4)
+        + (words <= 3)
+    ).astype(np.int64)
+
+
+@dataclass
+class TaskAnalysis:
+    """Ergebnis eines Durchlaufs über einen Task-Snapshot."""
+    day: date
+    total_tasks: int = 0
+    diagnostics: List[dict] = field(default_factory=list)
+    cleanup: List[dict] = field(default_factory=list)
+    unplanned: List[dict] = field(default_factory=list)
+    focus_candidates: List[dict] = field(default_factory=list)
+    label_suggestions: List[dict] = field(default_factory=list)
+    scoring: ScoreColumns = field(default_factory=ScoreColumns)
+    scores: object = None
+    _top: Dict[int, List[dict]] = field(default_factory=dict)
+
+    @property
+    def total_eligible(self) -> int:
+        return len(self.scoring)
+
+    def _top_rows(self, k: int) -> List[int]:
+        n = len(self.scoring)
+        k = max(0, min(k, n))
+        if k == 0:
+            return []
+        if isinstance(self.scores, list):
+            scores = self.scores
+            return heapq.nsmallest(k, range(n), key=lambda i: (-scores[i], i))
+        # Eindeutiger Schlüssel (Score absteigend, dann Reihenfolge im Snapshot)
+        # → argpartition liefert dieselben K Zeilen wie ein stabiler Sort
+        key = (self.scores.max() - self.scores) * n + np.arange(n)
+        if k < n:
+            rows = np.argpartition(key, k - 1)[:k]
+            return rows[np.argsort(key[rows])].tolist()
+        return np.argsort(key).tolist()
+
+    def _entry(self, row: int) -> dict:
+        cols = self.scoring
+        t = cols.tasks[row]
+        due, flags, today = cols.due[row], cols.flags[row], self.day.toordinal()
+        reason = []
+        if flags & IMPACT:
+            reason.append("impact")
+        if due == today:
+            reason.append("due today")
+        elif 0 < due <= today + 3:
+            reason.append("due < 3d")
+        elif due == DUE_PARSE_ERROR:
+            reason.append("due parse error")
+        elif due == NO_DUE:
+            reason.append("no due")
+        if flags & PRIVATE and due != today:
+            reason.append("private")
+        if cols.priority[row] == 4:
+            reason.append("prio 4")
+        if cols.words[row] <= 3:
+            reason.append("quick")
+        return {
+            "id": t.id,
+            "content": t.content,
+            "score": int(self.scores[row]),
+            "priority": cols.priority[row],
+            "due": t.due,
+            "labels": list(t.labels_lower),
+            "reason": reason
+        }
+
+    def top_prioritized(self, k: int) -> List[dict]:
+        """Die K Tasks mit dem höchsten Score, ohne den Rest zu sortieren."""
+        if k not in self._top:
+            self._top[k] = [self._entry(row) for row in self._top_rows(k)]
+        return self._top[k]
+
+    def top_focus(self, k: int) -> List[dict]:
+        """Fokus-Kandidaten nach Priorität, dann Fälligkeit (stabil wie sorted())."""
+        return heapq.nsmallest(
+            max(0, k),
+            self.focus_candidates,
+            key=lambda x: (-x["priority"], x["due"]["date"])
+        )
+
+
+def _cleanup_for(diag: dict):
+    missing = []
+    suggested_update = {}
+    if "missing_due" in diag["issues"]:
+        suggested_update["due_string"] = "tomorrow"; missing.append("due")
+    if "low_or_missing_priority" in diag["issues"]:
+        suggested_update["priority"] = 3; missing.append("priority")
+    if "missing_label" in diag["issues"] and diag.get("suggested_label"):
+        suggested_update["labels"] = [diag["suggested_label"]]; missing.append("label")
+    if not suggested_update:
+        return None
+    return {
+        "task_id": diag["id"],
+        "content": diag["content"],
+        "missing": missing,
+        "suggested_update": suggested_update
+    }
+
+
+def _due_ordinal(due) -> int:
+    if not due or "date" not in due:
+        return NO_DUE
+    try:
+        return datetime.fromisoformat(due["date"]).date().toordinal()
+    except (TypeError, ValueError):
+        return DUE_PARSE_ERROR
+
+
+def analyze_tasks(
+    tasks: List[TaskRecord],
+    user_id: str,
+    rules: LabelRules,
+    today: date = None,
+    backend: str = "auto",
+) -> TaskAnalysis:
+    """
+    Ein einziger Durchlauf über den Snapshot: Diagnose, Cleanup, ungeplante
+    Tasks, Fokus-Kandidaten, Label-Vorschläge und die Scoring-Spalten. Inhalt,
+    Wortanzahl und Labels liegen in der TaskRecord bereits normalisiert vor,
+    die Keyword-Regeln werden mit einem einzigen Scan des Inhalts ausgewertet.
+
+    Die Scores werden danach spaltenweise berechnet (``backend``: "python",
+    "numpy" oder "auto"); sortiert wird erst bei ``top_prioritized``.
+    """
+    today = today or datetime.utcnow().date()
+    result = TaskAnalysis(day=today, total_tasks=len(tasks))
+    cols = result.scoring
+
+    for t in tasks:
+        wc = t.word_count
+        prio = t.priority
+        due = t.due
+        labels = t.labels_lower
+        completed = t.is_completed
+        mine = t.creator_id == user_id
+        hits = rules.scan(t.content_lower)
+        suggested_label = None if t.labels else rules.suggest(hits, wc, prio, due)
+
+        # ungeplante Tasks (alle Ersteller)
+        if not due:
+            result.unplanned.append({
+                "id": t.id,
+                "content": t.content,
+                "project_id": t.project_id,
+                "priority": prio,
+                "created_at": t.created_at,
+                "needs_scheduling": True
+            })
+
+        # Label-Vorschläge für Tasks ohne Label
+        if not t.labels:
+            result.label_suggestions.append({
+                "task_id": t.id,
+                "content": t.content,
+                "suggested_label": suggested_label
+            })
+
+        # Fokus-Kandidaten: offen, fällig, Priorität ≥ 3, Dauer ≤ 60 Minuten
+        if not completed and due and prio >= 3:
+            duration = t.duration_amount or 0
+            if duration <= 60:
+                result.focus_candidates.append({
+                    "id": t.id,
+                    "content": t.content,
+                    "due": due,
+                    "priority": prio,
+                    "duration": duration,
+                    "labels": list(labels),
+                    "focus": any(x in labels for x in FOCUS_LABELS)
+                })
+
+        if not mine:
+            continue
+
+        # Diagnose + Cleanup (eigene Tasks)
+        task_issues = []
+        if not due:
+            task_issues.append("missing_due")
+        if prio == 1:
+            task_issues.append("low_or_missing_priority")
+        if not t.project_id:
+            task_issues.append("missing_project")
+        if not t.labels:
+            task_issues.append("missing_label")
+        if task_issues:
+            diag = {
+                "id": t.id,
+                "content": t.content,
+                "issues": task_issues,
+                "suggested_label": suggested_label
+            }
+            result.diagnostics.append(diag)
+            cleanup = _cleanup_for(diag)
+            if cleanup:
+                result.cleanup.append(cleanup)
+
+        # Scoring-Spalten (eigene, offene Tasks)
+        if completed:
+            continue
+        flags = 0
+        if any(l in labels for l in IMPACT_LABELS):
+            flags |= IMPACT
+        if rules.is_private(hits):
+            flags |= PRIVATE
+        cols.tasks.append(t)
+        cols.priority.append(prio)
+        cols.due.append(_due_ordinal(due))
+        cols.flags.append(flags)
+        cols.words.append(wc)
+
+    use_numpy = np is not None and (
+        backend == "numpy" or (backend == "auto" and len(cols) >= NUMPY_MIN_ROWS)
+    )
+    if use_numpy:
+        result.scores = _scores_numpy(cols, today.toordinal())
+    else:
+        result.scores = _scores_python(cols, today.toordinal())
+    return result
+
+
+def slot_suggestions(top_tasks: List[dict]) -> dict:
+    return {
+        "deep_work":   [t["content"] for t in top_tasks if "plan" in t.get("labels", []) or t["score"] >= 6],
+        "quick_wins":  [t["content"] for t in top_tasks if "quick" in t.get("reason", []) or t["score"] <= 4],
+        "today_focus": [t["content"] for t in top_tasks if "due today" in t.get("reason", [])]
+    }
@@ -0,0 +1,251 @@
+# services/replica.py
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from core.config import AppConfig
+from models.task import TaskRecord
+from services.scheduler import BULK, INTERACTIVE, UpstreamScheduler
+from services.store import TaskStore
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_TYPES = ["items", "projects", "labels"]
+
+
+def item_to_task(item: dict) -> TaskRecord:
+    """Sync-API-Item → kompakte Task mit den Feldern der REST-v2-Tasks."""
+    due = item.get("due")
+    if due and "T" in (due.get("date") or ""):
+        due = {**due, "datetime": due["date"], "date": due["date"][:10]}
+    return TaskRecord(
+        id=item["id"],
+        project_id=item.get("project_id"),
+        section_id=item.get("section_id"),
+        parent_id=item.get("parent_id"),
+        content=item.get("content", ""),
+        description=item.get("description", ""),
+        is_completed=bool(item.get("checked")),
+        labels=item.get("labels", ()),
+        order=item.get("child_order"),
+        priority=item.get("priority", 1),
+        due=due,
+        duration=item.get("duration"),
+        created_at=item.get("added_at"),
+        creator_id=item.get("added_by_uid"),
+        assignee_id=item.get("responsible_uid"),
+        assigner_id=item.get("assigned_by_uid"),
+    )
+
+
+def project_to_rest(project: dict) -> dict:
+    return {
+        "id": project["id"],
+        "name": project.get("name", ""),
+        "color": project.get("color"),
+        "parent_id": project.get("parent_id"),
+        "order": project.get("child_order"),
+        "is_favorite": project.get("is_favorite", False),
+        "is_inbox_project": bool(project.get("inbox_project")),
+        "is_shared": project.get("shared", False),
+        "view_style": project.get("view_style"),
+    }
+
+
+def label_to_rest(label: dict) -> dict:
+    return {
+        "id": label["id"],
+        "name": label.get("name", ""),
+        "color": label.get("color"),
+        "order": label.get("item_order"),
+        "is_favorite": label.get("is_favorite", False),
+    }
+
+
+class TodoistReplica:
+    """
+    Lokale Kopie von Items, Projekten und Labels auf Basis der Sync API.
+
+    Der erste Aufruf von ``sync()`` lädt alles (sync_token "*"), danach werden
+    nur noch die Deltas seit dem letzten sync_token angewendet. Mit ``store``
+    wird der Stand zusätzlich in SQLite gehalten und beim Start von dort
+    geladen, sodass auch nach einem Neustart nur Deltas nötig sind. Schreibzugriffe
+    melden sich über ``request_refresh()``; der nächste Lesezugriff holt dann
+    zuerst das Delta ab, damit die eigene Änderung sichtbar ist.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        config: AppConfig,
+        scheduler: Optional[UpstreamScheduler] = None,
+        store: Optional[TaskStore] = None,
+        token: Optional[str] = None,
+    ):
+        self.client = client
+        self.scheduler = scheduler or UpstreamScheduler(client, config)
+        self.store = store
+        self.sync_url = config.todoist_sync_url
+        self.headers = {
+            "Authorization": f"Bearer {token or config.todoist_token}",
+            "Content-Type": "application/json",
+        }
+        self.refresh_interval = config.replica_refresh_sec
+
+        self.sync_token = "*"
+        self.items: Dict[str, TaskRecord] = {}
+        self.projects: Dict[str, dict] = {}
+        self.labels: Dict[str, dict] = {}
+        self.version = 0
+
+        self._tasks: List[TaskRecord] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._wanted = 0
+        self._synced = 0
+        self._store_stale = False  # ein Delta fehlt im Store → vollen Stand schreiben
+
+        if store is not None:
+            self._restore()
+
+    @property
+    def ready(self) -> bool:
+        return self.sync_token != "*"
+
+    @property
+    def dirty(self) -> bool:
+        return self._wanted > self._synced
+
+    def tasks(self) -> List[TaskRecord]:
+        """Offene Tasks (Snapshot, nicht verändern)."""
+        return self._tasks
+
+    def request_refresh(self) -> None:
+        """Markiert die Replica als veraltet und weckt den Hintergrund-Loop."""
+        self._wanted += 1
+        self._wake.set()
+
+    async def ensure_fresh(self) -> None:
+        if not self.ready or self.dirty:
+            await self.sync()
+
+    async def sync(self, lane: int = INTERACTIVE) -> bool:
+        """Holt das Delta seit dem letzten sync_token. True, wenn sich etwas geändert hat."""
+        async with self._lock:
+            wanted = self._wanted
+            # reiner Lesezugriff → Retries auch bei 5xx erlaubt
+            r = await self.scheduler.request(
+                "POST",
+                self.sync_url,
+                lane=lane,
+                idempotent=True,
+                headers=self.headers,
+                json={
+                    "sync_token": self.sync_token,
+                    "resource_types": RESOURCE_TYPES,
+                },
+            )
+            delta = self._apply(r.json())
+            changed = delta["full_sync"] or any(delta[k] for k in RESOURCE_TYPES)
+            # ohne Änderungen liefert auch ein älterer sync_token ein leeres Delta
+            if self.store is not None and (changed or self._store_stale):
+                await self._persist(delta)
+            self._synced = max(self._synced, wanted)
+            return changed
+
+    async def _persist(self, delta: dict) -> None:
+        """
+        Schreibt das Delta in den Task-Store. Schlägt das fehl, fehlt dem Store
+        dieses Delta: der nächste Aufruf schreibt dann den vollständigen Stand
+        aus dem Speicher (full_sync) statt nur seines eigenen Deltas.
+        """
+        if self._store_stale:
+            full_sync, items, projects, labels = True, self.items, self.projects, self.labels
+        else:
+            full_sync, items, projects, labels = (
+                delta["full_sync"], delta["items"], delta["projects"], delta["labels"]
+            )
+        try:
+            await asyncio.to_thread(
+                self.store.apply, self.sync_token, full_sync, items, projects, labels
+            )
+        except Exception as e:
+            self._store_stale = True
+            logger.warning("Task-Store konnte nicht geschrieben werden: %s", e)
+        else:
+            self._store_stale = False
+
+    def _restore(self) -> None:
+        """Stand aus dem Task-Store übernehmen: sofort lesbar, danach nur Deltas."""
+        try:
+            token, tasks, projects, labels = self.store.load()
+        except Exception as e:
+            logger.warning("Task-Store nicht lesbar, starte mit vollem Sync: %s", e)
+            return
+        if token is None:
+            return
+        self.items = {t.id: t for t in tasks}
+        self.projects = {p["id"]: p for p in projects}
+        self.labels = {l["id"]: l for l in labels}
+        self._tasks = list(self.items.values())
+        self.sync_token = token
+        self.version += 1
+        logger.info("Replica aus Task-Store geladen: %d Tasks", len(tasks))
+
+    def _apply(self, data: dict) -> dict:
+        """Wendet eine Sync-Antwort an; Rückgabe ist das Delta (ID → Objekt bzw. None)."""
+        full_sync = bool(data.get("full_sync"))
+        if full_sync:
+            self.items.clear()
+            self.projects.clear()
+            self.labels.clear()
+
+        delta = {"full_sync": full_sync, "items": {}, "projects": {}, "labels": {}}
+        for item in data.get("items", []):
+            if item.get("is_deleted") or item.get("checked"):
+                self.items.pop(item["id"], None)
+                delta["items"][item["id"]] = None
+            else:
+                task = self.items[item["id"]] = item_to_task(item)
+                delta["items"][item["id"]] = task
+        for project in data.get("projects", []):
+            if project.get("is_deleted") or project.get("is_archived"):
+                self.projects.pop(project["id"], None)
+                delta["projects"][project["id"]] = None
+            else:
+                entry = self.projects[project["id"]] = project_to_rest(project)
+                delta["projects"][project["id"]] = entry
+        for label in data.get("labels", []):
+            if label.get("is_deleted"):
+                self.labels.pop(label["id"], None)
+                delta["labels"][label["id"]] = None
+            else:
+                entry = self.labels[label["id"]] = label_to_rest(label)
+                delta["labels"][label["id"]] = entry
+
+        self.sync_token = data.get("sync_token", self.sync_token)
+        if full_sync or any(delta[k] for k in RESOURCE_TYPES):
+            self._tasks = list(self.items.values())
+            self.version += 1
+        return delta
+
+    async def run(self, on_change=None) -> None:
+        """Hintergrund-Loop: Bootstrap, danach periodisch bzw. auf Anforderung Deltas."""
+        while True:
+            try:
+                if await self.sync(lane=BULK) and on_change:
+                    on_change()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Replica-Sync fehlgeschlagen: %s", e)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+
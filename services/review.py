@@ -0,0 +1,136 @@
+# services/review.py
+
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# ── Antwort-Grammatik ─────────────────────────────────────────────────────────
+# Eine Zeile pro Eintrag: "<Nr>[:| ] <Aktion>", Aktion = skip | akzeptieren |
+# kommagetrennte Felder (prio N, due <Datum|Text>, project <Name>, duration N)
+
+_LINE = re.compile(r"^[ \t]*(\d+)(?::|[ \t])[ \t]*(.*?)[ \t\r]*$", re.M)
+_FIELD = re.compile(
+    r"(?P<prio>prio)[^,\d]*(?P<prio_value>\d+)?[^,]*"
+    r"|(?P<due>due)(?P<due_value>[^,]*)"
+    r"|(?P<project>project)(?:[ \t]+(?P<project_value>[^,]*))?[^,]*"
+    r"|(?P<duration>duration)[^,\d]*(?P<duration_value>\d+)?[^,]*"
+    r"|[^,]*"
+)
+_FIELD_SEP = re.compile(r",\s*")
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+@dataclass
+class ReviewAction:
+    """Eine Antwortzeile: ``number`` ist 1-basiert im aktuellen Batch."""
+    number: int
+    kind: str  # skip | accept | update
+    fields: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def parse_review_response(text: str) -> List[ReviewAction]:
+    actions = []
+    for line in _LINE.finditer(text.lower()):
+        number, rest = int(line.group(1)), line.group(2)
+        if rest.startswith("skip"):
+            actions.append(ReviewAction(number, "skip"))
+            continue
+        if rest.startswith("akzeptieren"):
+            actions.append(ReviewAction(number, "accept"))
+            continue
+
+        action = ReviewAction(number, "update")
+        pos = 0
+        while pos <= len(rest):
+            m = _FIELD.match(rest, pos)
+            if m.group("prio"):
+                if m.group("prio_value"):
+                    action.fields["priority"] = int(m.group("prio_value"))
+                else:
+                    action.error = "Fehlende oder ungültige Priorität"
+            elif m.group("due"):
+                value = m.group("due_value")
+                iso = _ISO_DATE.search(value)
+                action.fields["due_string"] = iso.group(0) if iso else value.strip()
+            elif m.group("project"):
+                if m.group("project_value"):
+                    action.fields["project_name"] = m.group("project_value").strip()
+            elif m.group("duration"):
+                if m.group("duration_value"):
+                    action.fields["duration_minutes"] = int(m.group("duration_value"))
+                else:
+                    action.error = "Fehlende oder ungültige Dauer"
+            sep = _FIELD_SEP.match(rest, m.end())
+            if sep is None:
+                break
+            pos = sep.end()
+        actions.append(action)
+    return actions
+
+
+# ── Sessions ──────────────────────────────────────────────────────────────────
+
+@dataclass
+class ReviewSession:
+    id: str
+    items: List[dict]
+    expires_at: float
+    offset: int = 0
+    current: List[dict] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, len(self.items) - self.offset)
+
+    def next_batch(self, size: int) -> List[dict]:
+        """Nächster Ausschnitt; Antwortnummern beziehen sich auf diesen Batch."""
+        self.current = self.items[self.offset:self.offset + max(0, size)]
+        self.offset += len(self.current)
+        return self.current
+
+
+class ReviewSessionStore:
+    """
+    Kurzlebige Review-Sessions: Cleanup-Vorschläge werden beim Start einmal
+    übernommen, Folge-Batches und Antworten beziehen sich nur noch auf die
+    Session-ID. Begrenzt auf ``max_sessions`` (älteste zuerst verdrängt),
+    Sessions verfallen ``ttl`` Sekunden nach dem letzten Zugriff.
+    """
+
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: "OrderedDict[str, ReviewSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+
+    def create(self, items: List[dict]) -> ReviewSession:
+        now = time.monotonic()
+        self._expire(now)
+        session = ReviewSession(id=uuid.uuid4().hex, items=list(items), expires_at=now + self.ttl)
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[ReviewSession]:
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            # Zugriff verlängert; Reihenfolge bleibt nach Ablaufzeit sortiert
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(session_id)
+        return session
@@ -0,0 +1,149 @@
+# services/rules.py
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent / "core" / "label_rules.json"
+
+PRIVATE = "private"
+
+
+class KeywordMatcher:
+    """
+    Mehrfach-Matcher für Teilstring-Keywords: alle Keywords in einer einzigen
+    Regex (Lookahead, längstes Keyword zuerst), ein Scan pro Text.
+
+    An jeder Position wird nur das längste passende Keyword erfasst; alle
+    kürzeren Keywords, die dort ebenfalls passen, sind Präfixe davon. Deshalb
+    ordnet ``_categories`` jedem Keyword vorab die Kategorien aller seiner
+    Präfix-Keywords zu – das Ergebnis entspricht exakt ``any(w in text ...)``.
+    """
+
+    def __init__(self, groups: Dict[Hashable, Iterable[str]]):
+        by_keyword: Dict[str, set] = {}
+        for category, words in groups.items():
+            for w in words:
+                w = w.strip().lower()
+                if w:
+                    by_keyword.setdefault(w, set()).add(category)
+
+        keywords = sorted(by_keyword, key=len, reverse=True)
+        self._categories: Dict[str, FrozenSet[Hashable]] = {
+            kw: frozenset().union(*(cats for p, cats in by_keyword.items() if kw.startswith(p)))
+            for kw in keywords
+        }
+        self._pattern = (
+            re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+            if keywords else None
+        )
+
+    def scan(self, text: str) -> FrozenSet[Hashable]:
+        """Alle Kategorien, deren Keywords im (kleingeschriebenen) Text vorkommen."""
+        if self._pattern is None:
+            return frozenset()
+        found = set()
+        categories = self._categories
+        for kw in self._pattern.findall(text):
+            found |= categories[kw]
+        return frozenset(found)
+
+
+@dataclass(frozen=True)
+class LabelRule:
+    label: str
+    keywords: Tuple[str, ...] = ()
+    min_priority: Optional[int] = None
+    requires_due: bool = False
+
+
+class LabelRules:
+    """
+    Kompilierte Label-Regeln: geordnete Liste, erste passende Regel gewinnt.
+    Danach ``quick_label`` für kurze Tasks, sonst ``fallback_label``.
+    """
+
+    def __init__(
+        self,
+        rules: List[LabelRule],
+        private_keywords: Iterable[str] = (),
+        quick_label: str = "quick",
+        quick_max_words: int = 3,
+        fallback_label: str = "admin",
+    ):
+        self.rules = rules
+        self.quick_label = quick_label
+        self.quick_max_words = quick_max_words
+        self.fallback_label = fallback_label
+
+        groups: Dict[Hashable, Iterable[str]] = {i: r.keywords for i, r in enumerate(rules)}
+        groups[PRIVATE] = list(private_keywords)
+        self.matcher = KeywordMatcher(groups)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LabelRules":
+        rules = [
+            LabelRule(
+                label=r["label"],
+                keywords=tuple(r.get("keywords", ())),
+                min_priority=r.get("min_priority"),
+                requires_due=bool(r.get("requires_due", False)),
+            )
+            for r in data.get("label_rules", [])
+        ]
+        return cls(
+            rules,
+            private_keywords=data.get("private_keywords", ()),
+            quick_label=data.get("quick_label", "quick"),
+            quick_max_words=data.get("quick_max_words", 3),
+            fallback_label=data.get("fallback_label", "admin"),
+        )
+
+    def scan(self, content: str) -> FrozenSet[Hashable]:
+        """Ein Scan über den kleingeschriebenen Inhalt; Ergebnis für suggest/is_private."""
+        return self.matcher.scan(content)
+
+    def suggest(self, hits: FrozenSet[Hashable], wc: int, prio: int, due) -> str:
+        for i, rule in enumerate(self.rules):
+            if rule.keywords and i not in hits:
+                continue
+            if rule.min_priority is not None and prio < rule.min_priority:
+                continue
+            if rule.requires_due and not due:
+                continue
+            return rule.label
+        if wc <= self.quick_max_words:
+            return self.quick_label
+        return self.fallback_label
+
+    @staticmethod
+    def is_private(hits: FrozenSet[Hashable]) -> bool:
+        return PRIVATE in hits
+
+
+_loaded: Dict[str, Tuple[float, LabelRules]] = {}
+
+
+def rules_version(path: Optional[str] = None) -> int:
+    """Änderungsstand der Regeldatei (mtime in ns), z. B. für ETags."""
+    return os.stat(str(path or DEFAULT_RULES_PATH)).st_mtime_ns
+
+
+def load_label_rules(path: Optional[str] = None) -> LabelRules:
+    """
+    Lädt und kompiliert die Regeln aus der JSON-Datei. Das Ergebnis wird pro
+    Pfad gecacht und nur neu kompiliert, wenn sich die Datei geändert hat –
+    Regeln lassen sich so ohne Redeploy anpassen.
+    """
+    path = str(path or DEFAULT_RULES_PATH)
+    mtime = os.stat(path).st_mtime
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        rules = LabelRules.from_dict(json.load(f))
+    _loaded[path] = (mtime, rules)
+    return rules
@@ -0,0 +1,198 @@
+# services/scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+import httpx
+
+from core.config import AppConfig
+from core.metrics import UPSTREAM_LATENCY, UPSTREAM_REQUESTS, UPSTREAM_RETRIES, endpoint_label
+
+# Prioritäts-Lanes: kleinere Zahl wird zuerst bedient
+INTERACTIVE = 0
+BULK = 1
+
+# Wiederholbare Upstream-Status (429 immer, 5xx nur bei idempotenten Calls)
+RETRY_STATUS = {500, 502, 503, 504}
+
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 8.0
+
+# Gesamtbudget eines Calls (Warteschlange + Versuche + Backoff) in Vielfachen von todoist_timeout
+DEADLINE_FACTOR = 3
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Call konnte innerhalb seines Zeitbudgets nicht (erfolgreich) ausgeführt werden."""
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Retry-After als Sekunden (Zahl oder HTTP-Datum), None wenn nicht gesetzt."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token-Bucket mit Prioritäts-Warteschlange. Freie Tokens werden immer an den
+    Wartenden mit der kleinsten Lane (dann FIFO) vergeben; ``pause`` sperrt den
+    Bucket nach einem 429 bis zum Retry-After-Zeitpunkt.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: List[list] = []  # Heap aus [lane, seq, future]
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, now + seconds)
+
+    async def acquire(self, lane: int, timeout: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1 and now >= self._blocked_until:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [lane, next(self._seq), future])
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Kein Upstream-Kontingent innerhalb der Deadline frei")
+
+    async def _run_pump(self) -> None:
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():  # abgelaufen oder abgebrochen
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            future.set_result(None)
+
+
+class UpstreamScheduler:
+    """
+    Zentrale Ausführung aller Todoist-Calls: Token-Bucket nach Todoist-Quota,
+    Lanes (interaktive Reads vor Bulk-Writes), Retry mit Jitter-Backoff für
+    429/5xx unter Beachtung von Retry-After und eine Deadline pro Call.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, config: AppConfig):
+        self.client = client
+        self.timeout = config.todoist_timeout
+        self.max_retries = config.todoist_max_retries
+        self.bucket = TokenBucket(
+            rate=config.todoist_rate_limit / config.todoist_rate_window,
+            burst=config.todoist_rate_burst,
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        lane: int = INTERACTIVE,
+        idempotent: Optional[bool] = None,
+        stream: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Führt den Call aus und gibt die erfolgreiche Response zurück; sonst
+        httpx.HTTPStatusError (letzte Response) bzw. DeadlineExceeded.
+        ``idempotent`` (Default: nur GET) erlaubt Retries auch bei 5xx und
+        Verbindungsfehlern. Mit ``stream`` ist der Body noch nicht gelesen;
+        der Aufrufer muss die Response schließen.
+        """
+        if idempotent is None:
+            idempotent = method.upper() == "GET"
+        endpoint = endpoint_label(httpx.URL(url))
+        deadline = time.monotonic() + self.timeout * DEADLINE_FACTOR
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline für {method} {url} überschritten")
+            await self.bucket.acquire(lane, remaining)
+
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                request = self.client.build_request(
+                    method,
+                    url,
+                    timeout=min(self.timeout, max(0.1, deadline - time.monotonic())),
+                    **kwargs
+                )
+                r = await self.client.send(request, stream=stream)
+                if stream and r.is_error:
+                    await r.aread()  # Fehler-Body lesen, Verbindung freigeben
+                UPSTREAM_LATENCY.observe(time.perf_counter() - started, method, endpoint)
+                UPSTREAM_REQUESTS.inc(method, endpoint, str(r.status_code))
+                r.raise_for_status()
+                return r
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                reason = str(status)
+                if status == 429:
+                    retry_after = retry_after_seconds(e.response)
+                    self.bucket.pause(retry_after or BACKOFF_BASE_SEC)
+                elif not (idempotent and status in RETRY_STATUS):
+                    raise
+                error = e
+            except httpx.TransportError as e:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - started, method, endpoint)
+                UPSTREAM_REQUESTS.inc(method, endpoint, "error")
+                if not idempotent:
+                    raise
+                error = e
+                reason = type(e).__name__
+
+            attempt += 1
+            delay = random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                raise error
+            UPSTREAM_RETRIES.inc(method, endpoint, reason)
+            await asyncio.sleep(delay)
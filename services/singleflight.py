@@ -0,0 +1,47 @@
+# services/singleflight.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Bündelt gleichzeitige identische Aufrufe: solange ein Aufruf zum selben
+    Schlüssel läuft, warten weitere Aufrufer auf dessen Ergebnis (bzw. Fehler)
+    statt selbst einen Upstream-Call zu starten.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0      # tatsächlich ausgeführte Aufrufe
+        self.coalesced = 0  # Aufrufer, die ein laufendes Ergebnis mitgenutzt haben
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Eigener Task: bricht ein Aufrufer ab, läuft der Call für die anderen weiter
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def reset(self) -> None:
+        """Laufende Calls nicht mehr teilen (z. B. nach Schreibzugriffen)."""
+        self._inflight.clear()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # als abgerufen markieren, falls niemand mehr wartet
@@ -0,0 +1,141 @@
+# services/store.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from models.task import TaskRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id   TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id   TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    id   TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def account_key(token: str) -> str:
+    """Kurzer Hash des Tokens: erkennt, ob die Datei zu einem anderen Konto gehört."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _task_row(task: TaskRecord) -> tuple:
+    return task.id, json.dumps(task.to_dict(), ensure_ascii=False)
+
+
+class TaskStore:
+    """
+    Persistente Kopie der Replica in SQLite (WAL): Tasks, Projekte, Labels und
+    der letzte sync_token. Nach einem Neustart kann die Replica sofort aus der
+    Datei antworten und holt danach nur noch das Delta ab.
+
+    Die Methoden sind blockierend und werden per ``asyncio.to_thread`` aus der
+    Replica aufgerufen; ein Lock serialisiert den Zugriff auf die Verbindung.
+    """
+
+    def __init__(self, path: str, account: str):
+        self.path = path
+        self.account = account
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        if self._meta("account") not in (None, account):
+            # Datei gehört zu einem anderen Token → nicht wiederverwenden
+            self._clear()
+        self._set_meta("account", account)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _clear(self) -> None:
+        for table in ("tasks", "projects", "labels", "meta"):
+            self._db.execute(f"DELETE FROM {table}")
+
+    def load(self) -> Tuple[Optional[str], List[TaskRecord], List[dict], List[dict]]:
+        """(sync_token, Tasks, Projekte, Labels); sync_token None bei leerer Datei."""
+        with self._lock:
+            token = self._meta("sync_token")
+            if token is None:
+                return None, [], [], []
+            tasks = [
+                TaskRecord.from_dict(json.loads(d))
+                for (d,) in self._db.execute("SELECT data FROM tasks")
+            ]
+            projects = [json.loads(d) for (d,) in self._db.execute("SELECT data FROM projects")]
+            labels = [json.loads(d) for (d,) in self._db.execute("SELECT data FROM labels")]
+            return token, tasks, projects, labels
+
+    def apply(
+        self,
+        sync_token: str,
+        full_sync: bool,
+        tasks: Dict[str, Optional[TaskRecord]],
+        projects: Dict[str, Optional[dict]],
+        labels: Dict[str, Optional[dict]],
+    ) -> None:
+        """
+        Schreibt ein Delta in einer Transaktion (ID → Objekt bzw. None zum
+        Löschen). Bei ``full_sync`` wird der Bestand vorher geleert.
+        """
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                if full_sync:
+                    for table in ("tasks", "projects", "labels"):
+                        db.execute(f"DELETE FROM {table}")
+
+                if tasks:
+                    db.executemany(
+                        "DELETE FROM tasks WHERE id = ?",
+                        [(i,) for i, t in tasks.items() if t is None],
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO tasks (id, data) VALUES (?, ?)",
+                        [_task_row(t) for t in tasks.values() if t is not None],
+                    )
+
+                for table, entries in (("projects", projects), ("labels", labels)):
+                    db.executemany(
+                        f"DELETE FROM {table} WHERE id = ?",
+                        [(i,) for i, e in entries.items() if e is None],
+                    )
+                    db.executemany(
+                        f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)",
+                        [(i, json.dumps(e, ensure_ascii=False)) for i, e in entries.items() if e is not None],
+                    )
+
+                self._set_meta("sync_token", sync_token)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,246 @@
+# services/task_filter.py
+
+import shlex
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.task import TaskRecord
+from utils.due_dates import resolve_due_date
+
+# Zeichen mit Sonderbedeutung in Todoist-Filtern → Term wird nicht weitergereicht
+TODOIST_SPECIAL = set(",&|!()\\#@")
+
+FILTER_SYNTAX = (
+    "project:<Name|ID> label:<Name> priority:<N|A..B> due:<Von..Bis> "
+    "has_due:<true|false> creator:<me|ID> text:<Text>"
+)
+
+
+@dataclass
+class TaskFilter:
+    """
+    Geparster Filter für ``get_tasks``: alle Terme werden UND-verknüpft.
+    ``project_id`` und ``creator_id`` setzt der Service nach dem Auflösen von
+    Projektname bzw. ``me``.
+    """
+    project: Optional[str] = None
+    labels: List[str] = field(default_factory=list)
+    priority: Optional[Tuple[int, int]] = None
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+    has_due: Optional[bool] = None
+    creator: Optional[str] = None
+    text: Optional[str] = None
+
+    project_id: Optional[str] = None
+    project_name: Optional[str] = None
+    creator_id: Optional[str] = None
+
+    def matches(self, t: TaskRecord) -> bool:
+        if self.project_id is not None and t.project_id != self.project_id:
+            return False
+        if self.creator_id is not None and t.creator_id != self.creator_id:
+            return False
+        if self.labels and not all(l in t.labels_lower for l in self.labels):
+            return False
+        if self.priority is not None and not self.priority[0] <= t.priority <= self.priority[1]:
+            return False
+        if self.has_due is not None and bool(t.due) != self.has_due:
+            return False
+        if self.due_from is not None or self.due_to is not None:
+            day = _due_day(t)
+            if day is None:
+                return False
+            if self.due_from is not None and day < self.due_from:
+                return False
+            if self.due_to is not None and day > self.due_to:
+                return False
+        if self.text is not None and self.text not in t.content_lower:
+            return False
+        return True
+
+    def todoist_query(self, my_user_id: Optional[str] = None) -> Optional[str]:
+        """
+        Übersetzung in die Todoist-Filtersyntax, soweit möglich (None, wenn
+        kein Term übersetzbar ist). Das Ergebnis kann weiter sein als der
+        Filter selbst; der Aufrufer wendet ``matches`` danach erneut an.
+        """
+        terms = []
+        if self.project_name and _plain(self.project_name):
+            terms.append(f"#{self.project_name}")
+        terms.extend(f"@{l}" for l in self.labels if _plain(l))
+        if self.priority is not None and self.priority != (1, 4):
+            # Todoist: p1 = höchste Priorität = API-Priorität 4
+            levels = [f"p{5 - p}" for p in range(self.priority[0], self.priority[1] + 1)]
+            terms.append(levels[0] if len(levels) == 1 else "(" + " | ".join(levels) + ")")
+        if self.has_due is not None:
+            terms.append("!no date" if self.has_due else "no date")
+        # "due after/before" sind exklusiv
+        if self.due_from is not None:
+            terms.append(f"due after: {(self.due_from - timedelta(days=1)).isoformat()}")
+        if self.due_to is not None:
+            terms.append(f"due before: {(self.due_to + timedelta(days=1)).isoformat()}")
+        if self.creator_id is not None and self.creator_id == my_user_id:
+            terms.append("added by: me")
+        if self.text and _plain(self.text):
+            terms.append(f"search: {self.text}")
+        return " & ".join(terms) if terms else None
+
+
+def _plain(value: str) -> bool:
+    return not TODOIST_SPECIAL.intersection(value)
+
+
+def _due_day(t: TaskRecord) -> Optional[date]:
+    if not t.due or not t.due.get("date"):
+        return None
+    try:
+        return date.fromisoformat(t.due["date"][:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _priority_range(value: str) -> Tuple[int, int]:
+    low, sep, high = value.partition("..")
+    try:
+        low = int(low) if low else 1
+        high = (int(high) if high else 4) if sep else low
+    except ValueError:
+        raise ValueError(f"priority: Zahl oder Bereich A..B erwartet, nicht '{value}'")
+    if not 1 <= low <= high <= 4:
+        raise ValueError("priority: Werte zwischen 1 und 4, A ≤ B")
+    return low, high
+
+
+def _due_window(value: str, today: date) -> Tuple[Optional[date], Optional[date]]:
+    low, sep, high = value.partition("..")
+    if not sep:
+        high = low
+    bounds = []
+    for part in (low, high):
+        if not part.strip():
+            bounds.append(None)
+            continue
+        day = resolve_due_date(part, today)
+        if day is None:
+            raise ValueError(f"due: Datum '{part}' nicht interpretierbar")
+        bounds.append(day)
+    if bounds[0] and bounds[1] and bounds[0] > bounds[1]:
+        raise ValueError("due: Beginn liegt nach dem Ende")
+    return bounds[0], bounds[1]
+
+
+def _flag(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("true", "yes", "1", "ja"):
+        return True
+    if lowered in ("false", "no", "0", "nein"):
+        return False
+    raise ValueError(f"has_due: true oder false erwartet, nicht '{value}'")
+
+
+def parse_filter(expression: str, today: Optional[date] = None) -> TaskFilter:
+    """
+    Parst einen Filter wie ``project:Work label:do priority:3..4 due:today..friday``.
+    Werte mit Leerzeichen in Anführungszeichen; Wörter ohne Schlüssel zählen
+    als ``text``. Wirft ValueError bei unbekannten Schlüsseln oder Werten.
+    """
+    today = today or date.today()
+    try:
+        tokens = shlex.split(expression)
+    except ValueError as e:
+        raise ValueError(f"Filter nicht lesbar: {e}")
+
+    flt = TaskFilter()
+    words = []
+    for token in tokens:
+        key, sep, value = token.partition(":")
+        if not sep:
+            words.append(token)
+            continue
+        key = key.lower()
+        value = value.strip()
+        if not value:
+            raise ValueError(f"{key}: Wert fehlt")
+        if key == "project":
+            flt.project = value
+        elif key == "label":
+            flt.labels.append(value.lower())
+        elif key == "priority":
+            flt.priority = _priority_range(value)
+        elif key == "due":
+            flt.due_from, flt.due_to = _due_window(value, today)
+        elif key == "has_due":
+            flt.has_due = _flag(value)
+        elif key == "creator":
+            flt.creator = value
+        elif key == "text":
+            words.append(value)
+        else:
+            raise ValueError(f"Unbekannter Filter '{key}' (erlaubt: {FILTER_SYNTAX})")
+
+    if words:
+        flt.text = " ".join(words).lower()
+    return flt
+
+
+class TaskIndex:
+    """
+    Invertierte Indizes über einen Snapshot (Positionen in der Taskliste):
+    Projekt, Label, Ersteller, Priorität, ohne Due sowie nach Due-Datum
+    sortiert für Bereichsabfragen. Ein Filter prüft nur die Kandidaten der
+    kleinsten passenden Liste; die Reihenfolge des Snapshots bleibt erhalten.
+    """
+
+    def __init__(self, tasks: List[TaskRecord]):
+        self.tasks = tasks
+        self.by_project: Dict[str, List[int]] = {}
+        self.by_label: Dict[str, List[int]] = {}
+        self.by_creator: Dict[str, List[int]] = {}
+        self.by_priority: Dict[int, List[int]] = {}
+        self.no_due: List[int] = []
+
+        dated = []
+        for pos, t in enumerate(tasks):
+            self.by_project.setdefault(t.project_id, []).append(pos)
+            self.by_creator.setdefault(t.creator_id, []).append(pos)
+            self.by_priority.setdefault(t.priority, []).append(pos)
+            for label in t.labels_lower:
+                self.by_label.setdefault(label, []).append(pos)
+            day = _due_day(t)
+            if day is not None:
+                dated.append((day, pos))
+            elif not t.due:
+                self.no_due.append(pos)
+        dated.sort()
+        self._due_days = [d for d, _ in dated]
+        self._due_pos = [p for _, p in dated]
+
+    def _candidates(self, flt: TaskFilter) -> Iterable[int]:
+        lists = []
+        if flt.project_id is not None:
+            lists.append(self.by_project.get(flt.project_id, []))
+        if flt.creator_id is not None:
+            lists.append(self.by_creator.get(flt.creator_id, []))
+        for label in flt.labels:
+            lists.append(self.by_label.get(label, []))
+        if flt.priority is not None and flt.priority != (1, 4):
+            lists.append(sorted(
+                pos for p in range(flt.priority[0], flt.priority[1] + 1)
+                for pos in self.by_priority.get(p, ())
+            ))
+        if flt.due_from is not None or flt.due_to is not None:
+            lo = bisect_left(self._due_days, flt.due_from) if flt.due_from else 0
+            hi = bisect_right(self._due_days, flt.due_to) if flt.due_to else len(self._due_days)
+            lists.append(sorted(self._due_pos[lo:hi]))
+        if flt.has_due is False:
+            lists.append(self.no_due)
+        if not lists:
+            return range(len(self.tasks))
+        return min(lists, key=len)
+
+    def select(self, flt: TaskFilter) -> List[TaskRecord]:
+        tasks = self.tasks
+        return [tasks[pos] for pos in self._candidates(flt) if flt.matches(tasks[pos])]
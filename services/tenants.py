@@ -0,0 +1,191 @@
+# services/tenants.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from core.config import AppConfig
+from services.replica import TodoistReplica
+from services.scheduler import UpstreamScheduler
+from services.store import TaskStore, account_key
+from services.todoist import InvalidToken, TodoistService
+from services.write_behind import journal_path
+
+logger = logging.getLogger(__name__)
+
+# Von Todoist abgelehnte Tokens: so lange ohne erneuten Upstream-Call ablehnen
+REJECTED_TTL_SEC = 300
+REJECTED_MAX = 4096
+
+
+@dataclass
+class Tenant:
+    service: TodoistService
+    replica_task: Optional[asyncio.Task] = None
+    store: Optional[TaskStore] = None
+
+    @property
+    def busy(self) -> bool:
+        """Angenommene, noch nicht gesendete Writes: Tenant darf nicht geschlossen werden."""
+        queue = self.service.write_behind
+        return queue is not None and queue.busy
+
+    def close(self) -> None:
+        self.service.close()
+        if self.replica_task is not None:
+            self.replica_task.cancel()
+        if self.store is not None:
+            self.store.close()
+
+
+class TenantRegistry:
+    """
+    Ein TodoistService pro Todoist-Konto (Schlüssel: Hash des Tokens), in
+    einem LRU mit Obergrenze für Anzahl und geschätzten Speicher. Alle Tenants
+    teilen sich den HTTP-Client und damit den Verbindungspool; Quota,
+    Caches und Replica sind pro Konto getrennt. Ein neuer Token wird einmal
+    bei Todoist geprüft, bevor Replica, Dateien oder Journal entstehen.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, config: AppConfig):
+        self.client = client
+        self.config = config
+        self.max_tenants = config.tenant_max
+        self.memory_budget = config.tenant_memory_budget_mb * 1024 * 1024
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._rejected: "OrderedDict[str, float]" = OrderedDict()  # Schlüssel → Ablauf
+        self._validating: Dict[str, asyncio.Task] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def estimated_bytes(self) -> int:
+        return sum(t.service.estimated_bytes() for t in self._tenants.values())
+
+    async def get(self, token: str) -> TodoistService:
+        """
+        Service zum Token; wirft InvalidToken, wenn Todoist ihn ablehnt, bzw.
+        httpx.HTTPError, wenn er (noch) nicht geprüft werden konnte.
+        """
+        key = account_key(token)
+        tenant = self._tenants.get(key)
+        if tenant is None:
+            if self._is_rejected(key):
+                raise InvalidToken(key)
+            # gleichzeitige Erstzugriffe teilen sich die Prüfung
+            task = self._validating.get(key)
+            if task is None:
+                task = self._validating[key] = asyncio.create_task(self._validate(key, token))
+                task.add_done_callback(lambda _: self._validating.pop(key, None))
+            user_id, scheduler = await asyncio.shield(task)
+            tenant = self._tenants.get(key)
+        if tenant is None:
+            tenant = self._tenants[key] = self._create(key, token, user_id, scheduler)
+        else:
+            self._tenants.move_to_end(key)
+        self._evict()
+        return tenant.service
+
+    async def _validate(self, key: str, token: str) -> Tuple[str, UpstreamScheduler]:
+        # Quota gilt pro Todoist-Konto → eigener Scheduler, gemeinsamer Client
+        scheduler = UpstreamScheduler(self.client, self.config)
+        try:
+            r = await scheduler.request(
+                "POST", self.config.todoist_sync_url, idempotent=True,
+                headers={"Authorization": f"Bearer {token}"},
+                json={"sync_token": "*", "resource_types": ["user"]},
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (401, 403):
+                self._reject(key)
+                raise InvalidToken(key) from e
+            raise
+        return str(r.json()["user"]["id"]), scheduler
+
+    def _is_rejected(self, key: str) -> bool:
+        expires = self._rejected.get(key)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._rejected[key]
+        return False
+
+    def _reject(self, key: str) -> None:
+        self._rejected[key] = time.monotonic() + REJECTED_TTL_SEC
+        self._rejected.move_to_end(key)
+        while len(self._rejected) > REJECTED_MAX:
+            self._rejected.popitem(last=False)
+        # Zustand aus früheren Sitzungen des (inzwischen ungültigen) Tokens entfernen
+        for path in self._state_files(key):
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info("Token abgelehnt, Datei entfernt: %s", path)
+
+    def _state_files(self, key: str) -> List[str]:
+        config, paths = self.config, []
+        if config.tenant_store_dir:
+            db = os.path.join(config.tenant_store_dir, f"{key}.db")
+            paths += [db, db + "-wal", db + "-shm"]
+        if config.write_behind:
+            paths.append(os.path.join(config.write_journal_path, f"{key}.ndjson"))
+        return paths
+
+    def _create(
+        self, key: str, token: str, user_id: str, scheduler: UpstreamScheduler
+    ) -> Tenant:
+        config = self.config
+        store = replica = None
+        if config.replica_enabled:
+            if config.tenant_store_dir:
+                os.makedirs(config.tenant_store_dir, exist_ok=True)
+                store = TaskStore(os.path.join(config.tenant_store_dir, f"{key}.db"), account=key)
+            replica = TodoistReplica(
+                self.client, config, scheduler=scheduler, store=store, token=token
+            )
+
+        service = TodoistService(
+            self.client, config, replica=replica, scheduler=scheduler, token=token,
+            user_id=user_id,
+            journal_path=journal_path(config.write_journal_path, key) if config.write_behind else None,
+        )
+        if service.write_behind is not None:
+            # offene Operationen aus dem Journal (nach Neustart oder Verdrängung)
+            service.write_behind.start()
+        tenant = Tenant(service=service, store=store)
+        if replica is not None:
+            tenant.replica_task = asyncio.create_task(
+                replica.run(on_change=service.on_replica_change)
+            )
+        logger.info("Tenant angelegt: %s (%d aktiv)", key, len(self._tenants) + 1)
+        return tenant
+
+    def _evict(self) -> None:
+        # Der zuletzt genutzte Tenant bleibt immer erhalten, Tenants mit offenen
+        # Write-Behind-Operationen ebenso (werden bei einem späteren Aufruf verdrängt)
+        while len(self._tenants) > 1 and (
+            len(self._tenants) > self.max_tenants
+            or self.estimated_bytes() > self.memory_budget
+        ):
+            newest = next(reversed(self._tenants))
+            key = next(
+                (k for k, t in self._tenants.items() if k != newest and not t.busy), None
+            )
+            if key is None:
+                break
+            tenant = self._tenants.pop(key)
+            tenant.close()
+            self.evictions += 1
+            logger.info("Tenant verdrängt: %s", key)
+
+    def close(self) -> None:
+        for tenant in self._tenants.values():
+            tenant.close()
+        self._tenants.clear()
@@ -1,118 +1,478 @@
 # services/todoist.py
 
 import httpx
+import logging
 import uuid
-import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 from fastapi import HTTPException
 from core.config import AppConfig
-from fastapi import Depends, Request
+from core.metrics import CACHE_REQUESTS
+from models.task import TaskRecord
+from fastapi import Request
+from services.cache import TaskSnapshotCache
+from services.dashboard import MaterializedDashboard
+from services.indexes import LabelIndex, ProjectIndex
+from services.planner import TaskAnalysis, analyze_tasks
+from services.rules import load_label_rules, rules_version
+from services.replica import TodoistReplica
+from services.review import ReviewSessionStore
+from services.scheduler import BULK, INTERACTIVE, UpstreamScheduler
+from services.singleflight import SingleFlight
+from services.task_filter import TaskFilter, TaskIndex
+from services.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# Maximale Anzahl Commands pro Sync-Request (Todoist-Limit)
+SYNC_BATCH_SIZE = 100
+
+# Seitengröße beim seitenweisen Export über die REST-API
+EXPORT_PAGE_SIZE = 200
+
+# Geschätzter Speicher pro Service bzw. pro Task/Projekt/Label (Tenant-Budget)
+BASE_BYTES = 64 * 1024
+TASK_BYTES = 2048
+NAME_BYTES = 512
+
+
+def item_update_commands(task_id: str, fields: dict) -> List[dict]:
+    """
+    Übersetzt Update-Felder im Format von UpdateTaskInput in Sync-Commands:
+    ein item_update für Inhalt/Due/Priorität/Labels/Dauer und ggf. ein
+    item_move, weil sich das Projekt über item_update nicht ändern lässt.
+    """
+    args = {"id": task_id}
+    if fields.get("content") is not None:
+        args["content"] = fields["content"]
+    if fields.get("due_string"):
+        args["due"] = {"string": fields["due_string"]}
+    if fields.get("priority") is not None:
+        args["priority"] = fields["priority"]
+    if fields.get("labels") is not None:
+        args["labels"] = fields["labels"]
+    if fields.get("duration_minutes"):
+        args["duration"] = {"amount": fields["duration_minutes"], "unit": "minute"}
+
+    commands = []
+    if len(args) > 1:
+        commands.append({"type": "item_update", "uuid": str(uuid.uuid4()), "args": args})
+    if fields.get("project_id"):
+        commands.append({
+            "type": "item_move",
+            "uuid": str(uuid.uuid4()),
+            "args": {"id": task_id, "project_id": fields["project_id"]},
+        })
+    return commands
+
+
+def item_add_command(fields: dict) -> dict:
+    """
+    item_add-Command mit temp_id; ``fields`` mit content und optional
+    project_id, due_string bzw. due_date (ISO) und duration_minutes.
+    """
+    args = {"content": fields["content"]}
+    if fields.get("project_id"):
+        args["project_id"] = fields["project_id"]
+    if fields.get("due_date"):
+        args["due"] = {"date": fields["due_date"]}
+    elif fields.get("due_string"):
+        args["due"] = {"string": fields["due_string"]}
+    if fields.get("duration_minutes"):
+        args["duration"] = {"amount": fields["duration_minutes"], "unit": "minute"}
+    return {
+        "type": "item_add",
+        "uuid": str(uuid.uuid4()),
+        "temp_id": str(uuid.uuid4()),
+        "args": args,
+    }
+
+
+def item_close_command(task_id: str) -> dict:
+    return {"type": "item_close", "uuid": str(uuid.uuid4()), "args": {"id": task_id}}
+
+
+def sync_error(status) -> Optional[str]:
+    """None bei Erfolg, sonst die Fehlermeldung aus dem sync_status-Eintrag."""
+    if status == "ok":
+        return None
+    if isinstance(status, dict):
+        return status.get("error") or str(status)
+    return "Keine Rückmeldung von Todoist"
+
 
 class TodoistService:
-    def __init__(self, client: httpx.AsyncClient, config: AppConfig):
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        config: AppConfig,
+        replica: Optional[TodoistReplica] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+        token: Optional[str] = None,
+        user_id: Optional[str] = None,
+        journal_path: Optional[str] = None,
+    ):
         self.client = client
+        self.scheduler = scheduler or UpstreamScheduler(client, config)
+        self.singleflight = SingleFlight()
         self.base_url = config.todoist_api_url
+        self.sync_url = config.todoist_sync_url
         self.headers = {
-            "Authorization": f"Bearer {config.todoist_token}",
+            "Authorization": f"Bearer {token or config.todoist_token}",
             "Content-Type": "application/json",
         }
-        self.timeout = config.todoist_timeout
+        self.replica = replica
+        self.label_rules_file = config.label_rules_file
+        self.scoring_backend = config.scoring_backend
+
+        # Gemeinsamer Snapshot für alle Analyse-Endpoints
+        self.task_cache = TaskSnapshotCache(
+            self._load_tasks,
+            ttl=config.task_cache_ttl,
+            stale_ttl=config.task_cache_stale_ttl,
+            on_change=self._on_snapshot_change,
+        )
+        self.projects = ProjectIndex(self._load_projects, ttl=config.project_index_ttl)
+        self.labels = LabelIndex(
+            self._load_labels, ttl=config.label_index_ttl, sync=self.sync_commands
+        )
+        self._analysis = None  # (Snapshot, user_id, Regeln, Analyse)
+        self._index: Optional[TaskIndex] = None
+        self.reviews = ReviewSessionStore(
+            ttl=config.review_session_ttl, max_sessions=config.review_session_max
+        )
+        self.dashboard = MaterializedDashboard(
+            self._current_analysis, interval=config.dashboard_refresh_sec
+        )
+        # Write-Behind für complete_task/update_task (None = synchron)
+        self.write_behind: Optional[WriteBehindQueue] = None
+        if journal_path:
+            self.write_behind = WriteBehindQueue(
+                journal_path, send=self.send_sync_batch, on_flushed=self.after_write,
+                status_error=sync_error, batch_size=SYNC_BATCH_SIZE,
+                max_attempts=config.write_behind_max_attempts,
+            )
+        self._user_id = user_id
+
+    # ── Transport ─────────────────────────────────────────────────────────────
+
+    async def _request(
+        self, method: str, url: str, lane: int = INTERACTIVE, **kwargs
+    ) -> httpx.Response:
+        """Alle Todoist-Calls laufen über den Scheduler (Quota, Lanes, Retries)."""
+        return await self.scheduler.request(
+            method, url, lane=lane, headers=self.headers, **kwargs
+        )
+
+    async def _get_json(self, url: str, params: Optional[dict] = None):
+        """
+        GET mit Single-Flight: gleichzeitige Aufrufe mit gleicher URL und
+        gleichen Parametern teilen sich einen Upstream-Call und dessen
+        geparstes Ergebnis (nicht verändern).
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+
+        async def fetch():
+            r = await self._request("GET", url, params=params)
+            return r.json()
+
+        return await self.singleflight.do(key, fetch)
+
+    async def current_user_id(self) -> str:
+        """ID des Kontos hinter dem Token; ohne Vorgabe einmalig per Sync API ermittelt."""
+        if self._user_id is None:
+            r = await self._request(
+                "POST", self.sync_url, idempotent=True,
+                json={"sync_token": "*", "resource_types": ["user"]}
+            )
+            self._user_id = str(r.json()["user"]["id"])
+        return self._user_id
+
+    def estimated_bytes(self) -> int:
+        """Grobe Speicherschätzung für das Tenant-Budget (Tasks, Projekte, Labels)."""
+        if self.replica is not None and self.replica.ready:
+            tasks = len(self.replica.items)
+            names = len(self.replica.projects) + len(self.replica.labels)
+        else:
+            tasks = len(self.task_cache.peek() or ())
+            names = 0
+        return BASE_BYTES + tasks * TASK_BYTES + names * NAME_BYTES
+
+    def after_write(self) -> None:
+        """Snapshot invalidieren und Replica-Delta anfordern."""
+        self.task_cache.invalidate()
+        # vor dem Write gestartete GETs liefern evtl. den alten Stand
+        self.singleflight.reset()
+        self.dashboard.invalidate()
+        if self.replica is not None:
+            self.replica.request_refresh()
+
+    def read_version(self) -> Optional[str]:
+        """
+        Stand der Daten hinter den Analyse-Endpoints (Snapshot, Nutzer, Tag,
+        Regeln) für ETags; None, wenn der nächste Lesezugriff neu laden müsste.
+        Aus den Daten abgeleitet: gleicher Snapshot → gleiches ETag, auch nach
+        einem Reload oder Neustart.
+        """
+        version = self.task_cache.current_version()
+        if version is None or self._user_id is None:
+            return None
+        return ":".join(map(str, (
+            version, self._user_id, datetime.utcnow().date(),
+            rules_version(self.label_rules_file),
+        )))
+
+    def _on_snapshot_change(self) -> None:
+        # neuer Snapshot (auch per TTL) → vorberechnetes Dashboard veraltet
+        self.dashboard.invalidate()
+
+    def close(self) -> None:
+        """Hintergrund-Tasks des Services beenden."""
+        self.dashboard.close()
+        if self.write_behind is not None:
+            self.write_behind.close()
+
+    def on_replica_change(self) -> None:
+        """Callback für den Replica-Loop: abgeleitete Caches verwerfen."""
+        self.task_cache.invalidate()
+        self.projects.invalidate()
+        self.labels.invalidate()
+        self.dashboard.invalidate()
+
+    # ── Tasks ─────────────────────────────────────────────────────────────────
 
     async def get_tasks(self, limit: int = 50, offset: int = 0):
-        r = await self.client.get(
+        return await self._get_json(
             f"{self.base_url}/tasks",
-            headers=self.headers,
             params={"limit": limit, "offset": offset},
-            timeout=self.timeout
         )
-        r.raise_for_status()
-        return r.json()
 
-    async def close_task(self, task_id: str):
-        r = await self.client.post(
-            f"{self.base_url}/tasks/{task_id}/close",
-            headers=self.headers,
-            timeout=self.timeout
+    async def stream_tasks(self, limit: int = 50, offset: int = 0) -> httpx.Response:
+        """Upstream-Response ungelesen (Passthrough); Aufrufer muss ``aclose()`` aufrufen."""
+        return await self._request(
+            "GET",
+            f"{self.base_url}/tasks",
+            params={"limit": limit, "offset": offset},
+            stream=True,
         )
-        r.raise_for_status()
+
+    async def get_all_tasks(self) -> List[dict]:
+        return await self._get_json(f"{self.base_url}/tasks")
+
+    async def iter_tasks(self, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[dict]:
+        """
+        Alle offenen Tasks einzeln, ohne die komplette Liste aufzubauen:
+        aus der Replica, sonst Seite für Seite über ``get_tasks``.
+        """
+        if self.replica is not None and self.replica.ready:
+            await self.replica.ensure_fresh()
+            for t in self.replica.tasks():
+                yield t.to_dict()
+            return
+
+        offset = 0
+        first_ids = set()
+        while True:
+            page = await self.get_tasks(page_size, offset)
+            # Ignoriert der Upstream limit/offset, kommt dieselbe Seite erneut
+            if not page or page[0].get("id") in first_ids:
+                return
+            first_ids.add(page[0].get("id"))
+            for t in page:
+                yield t
+            if len(page) != page_size:
+                return
+            offset += page_size
+
+    async def task_snapshot(self) -> List[TaskRecord]:
+        """Alle offenen Tasks aus dem Snapshot-Cache (nicht verändern)."""
+        return await self.task_cache.get()
+
+    async def analysis(self, user_id: str) -> TaskAnalysis:
+        """
+        Analyse des aktuellen Snapshots; wird pro Snapshot, Nutzer, Regelsatz
+        und Tag nur einmal berechnet und von allen Analyse-Endpoints geteilt.
+        """
+        tasks = await self.task_snapshot()
+        rules = load_label_rules(self.label_rules_file)
+        cached = self._analysis
+        if cached and cached[0] is tasks and cached[1] == user_id and cached[2] is rules:
+            result = cached[3]
+            if result.day == datetime.utcnow().date():
+                CACHE_REQUESTS.inc("analysis", "hit")
+                return result
+        CACHE_REQUESTS.inc("analysis", "miss")
+        result = analyze_tasks(tasks, user_id, rules, backend=self.scoring_backend)
+        self._analysis = (tasks, user_id, rules, result)
+        return result
+
+    async def _current_analysis(self) -> TaskAnalysis:
+        return await self.analysis(await self.current_user_id())
+
+    def _task_index(self, tasks: List[TaskRecord]) -> TaskIndex:
+        """Filter-Indizes, einmal pro Snapshot aufgebaut."""
+        if self._index is not None and self._index.tasks is tasks:
+            CACHE_REQUESTS.inc("task_index", "hit")
+            return self._index
+        CACHE_REQUESTS.inc("task_index", "miss")
+        self._index = TaskIndex(tasks)
+        return self._index
+
+    async def filter_tasks(self, flt: TaskFilter) -> List[TaskRecord]:
+        """
+        Tasks zum Filter in Snapshot-Reihenfolge. Bei warmem Cache (Replica
+        bereit oder Snapshot vorhanden) über die Indizes des Snapshots, sonst
+        per Todoist-``filter`` vorgefiltert und lokal exakt nachgeprüft.
+        """
+        if flt.project:
+            project = await self.projects.lookup(flt.project)
+            flt.project_id = project["id"] if project else flt.project
+            flt.project_name = project["name"] if project else None
+        if flt.creator:
+            me = flt.creator.lower() == "me"
+            flt.creator_id = await self.current_user_id() if me else flt.creator
+
+        warm = (self.replica is not None and self.replica.ready) or self.task_cache.peek() is not None
+        query = None if warm else flt.todoist_query(self._user_id)
+        if query is None:
+            return self._task_index(await self.task_snapshot()).select(flt)
+
+        found = await self._get_json(f"{self.base_url}/tasks", params={"filter": query})
+        return [t for t in map(TaskRecord.from_dict, found) if flt.matches(t)]
+
+    async def _load_tasks(self) -> List[TaskRecord]:
+        # Bevorzugt die lokale Replica: nach Schreibzugriffen nur das Delta nachladen
+        if self.replica is not None and self.replica.ready:
+            try:
+                await self.replica.ensure_fresh()
+                return self.replica.tasks()
+            except httpx.HTTPError as e:
+                logger.warning("Replica nicht verfügbar, lade Tasks per REST: %s", e)
+        return [TaskRecord.from_dict(t) for t in await self.get_all_tasks()]
+
+    async def close_task(self, task_id: str):
+        await self._request("POST", f"{self.base_url}/tasks/{task_id}/close")
+        self.after_write()
 
     async def add_task(self, payload: dict):
         if "duration_minutes" in payload:
-            payload["duration"] = {
-                "amount": payload.pop("duration_minutes"),
-                "unit": "minute"
-            }
+            payload["duration"] = payload.pop("duration_minutes")
+            payload["duration_unit"] = "minute"
 
-        r = await self.client.post(
-            f"{self.base_url}/tasks",
-            headers=self.headers,
-            json=payload,
-            timeout=self.timeout
-        )
-        r.raise_for_status()
+        r = await self._request("POST", f"{self.base_url}/tasks", json=payload)
+        self.after_write()
         return r.json()
 
     async def update_task(self, task_id: str, payload: dict):
         if "duration_minutes" in payload:
-            payload["duration"] = {
-                "amount": payload.pop("duration_minutes"),
-                "unit": "minute"
-            }
-
-        r = await self.client.patch(
-            f"{self.base_url}/tasks/{task_id}",
-            headers=self.headers,
-            json=payload,
-            timeout=self.timeout
-        )
-        r.raise_for_status()
-
-    async def sync_update_labels(self, task_id: str, label_names: list[str]):
-        # 1. Labels laden
-        r_labels = await self.client.get(
-            "https://api.todoist.com/rest/v2/labels",
-            headers=self.headers,
-            timeout=self.timeout
+            payload["duration"] = payload.pop("duration_minutes")
+            payload["duration_unit"] = "minute"
+
+        r = await self._request("POST", f"{self.base_url}/tasks/{task_id}", json=payload)
+        self.after_write()
+        return r.json() if r.content else None
+
+    # ── Projekte & Labels ─────────────────────────────────────────────────────
+
+    async def get_projects(self) -> List[dict]:
+        return await self._get_json(f"{self.base_url}/projects")
+
+    async def _load_projects(self) -> List[dict]:
+        if self.replica is not None and self.replica.ready:
+            return list(self.replica.projects.values())
+        return await self.get_projects()
+
+    async def get_labels(self) -> List[dict]:
+        return await self._get_json(f"{self.base_url}/labels")
+
+    async def _load_labels(self) -> List[dict]:
+        if self.replica is not None and self.replica.ready:
+            return list(self.replica.labels.values())
+        return await self.get_labels()
+
+    # ── Sync API (Batch-Operationen) ──────────────────────────────────────────
+
+    async def send_sync_batch(self, commands: List[dict]) -> dict:
+        """
+        Ein Sync-Request mit max. SYNC_BATCH_SIZE Commands; wirft httpx.HTTPError.
+        Commands tragen eine uuid → Todoist dedupliziert, Retries sind sicher.
+        """
+        r = await self._request(
+            "POST", self.sync_url, lane=BULK, idempotent=True,
+            json={"commands": commands}
         )
-        r_labels.raise_for_status()
-        label_map = {l["name"].strip().lower(): l["id"] for l in r_labels.json()}
+        return r.json()
+
+    async def sync_commands(self, commands: List[dict]) -> dict:
+        """
+        Schickt Sync-Commands in Blöcken von max. SYNC_BATCH_SIZE.
+        Gibt den zusammengeführten sync_status bzw. temp_id_mapping zurück.
+        Schlägt ein Block fehl, erhalten dessen uuids einen Fehler-Status,
+        die übrigen Blöcke werden trotzdem gesendet.
+        """
+        result = {"sync_status": {}, "temp_id_mapping": {}}
+        for i in range(0, len(commands), SYNC_BATCH_SIZE):
+            chunk = commands[i:i + SYNC_BATCH_SIZE]
+            try:
+                data = await self.send_sync_batch(chunk)
+            except httpx.HTTPError as e:
+                for c in chunk:
+                    result["sync_status"][c["uuid"]] = {"error": f"Sync-Request fehlgeschlagen: {e}"}
+                continue
+            result["sync_status"].update(data.get("sync_status", {}))
+            result["temp_id_mapping"].update(data.get("temp_id_mapping", {}))
+
+        if commands:
+            self.after_write()
+        return result
+
+    async def sync_update_labels(
+        self, task_id: str, label_names: list[str], create_missing: bool = False
+    ):
+        # 1. Labels über den gecachten Index auflösen (ggf. fehlende anlegen)
+        resolved = await self.labels.resolve(label_names, create_missing=create_missing)
 
-        # 2. IDs sammeln
-        label_ids = [int(label_map[n.lower()]) for n in label_names if n.lower() in label_map]
-        print("🔎 Mapped label_ids:", label_ids)
+        # 2. Namen sammeln (Sync API v9 erwartet Label-Namen)
+        names = [label["name"] for label in resolved.values() if label]
+        logger.debug("sync_update_labels task_id=%s labels=%s", task_id, names)
 
-        if not label_ids:
+        if not names:
             raise HTTPException(status_code=400, detail="Keines der angegebenen Labels gefunden.")
 
         # 3. Sync-Command definieren
-        commands = [{
-            "type": "item_update",
-            "uuid": str(uuid.uuid4()),
-            "args": {
-                "id": task_id,
-                "label_ids": label_ids
-            }
-        }]
-        print("📦 Commands payload:", commands)
-
-        # 4. Sync-Aufruf—korrekt als JSON
-        sync_url = "https://api.todoist.com/sync/v9/sync"
-        payload = {
-            "sync_token": "*",
-            "commands": commands
-        }
+        commands = item_update_commands(task_id, {"labels": names})
 
-        r = await self.client.post(
-            sync_url,
-            headers=self.headers,
-            json=payload,
-            timeout=self.timeout
-        )
-        print("🔁 Sync-Response status:", r.status_code, "body:", r.text)
-        r.raise_for_status()
-        return r.json()
+        # 4. Sync-Aufruf
+        result = await self.sync_commands(commands)
+        logger.debug("sync_update_labels commands=%s result=%s", commands, result)
+        return result
+
+class InvalidToken(Exception):
+    """Todoist lehnt den Token ab (401/403); es wurde kein Tenant angelegt."""
 
-async def get_todoist_service(
-    request: Request,
-    config: AppConfig = Depends(),
-) -> TodoistService:
-    return request.app.state.todoist_service
\ No newline at end of file
+
+def bearer_token(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+async def get_todoist_service(request: Request) -> TodoistService:
+    tenants = getattr(request.app.state, "tenants", None)
+    if tenants is None:
+        return request.app.state.todoist_service
+
+    # Multi-Tenant: Todoist-Token des Aufrufers aus dem Authorization-Header
+    token = bearer_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Todoist-Token fehlt (Authorization: Bearer …)")
+    try:
+        return await tenants.get(token)
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Todoist lehnt den Token ab")
+    except httpx.HTTPError as e:
+        logger.warning("Token konnte nicht geprüft werden: %s", e)
+        raise HTTPException(
+            status_code=503, detail="Todoist-Token konnte nicht geprüft werden",
+            headers={"Retry-After": "5"},
+        )
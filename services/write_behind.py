@@ -0,0 +1,357 @@
+# services/write_behind.py
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+from core.metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_OPS = REGISTRY.register(Counter(
+    "write_behind_operations_total", "Operationen der Write-Behind-Queue", ("event",)
+))
+
+# Abgeschlossene Operationen, deren Status abfragbar bleibt
+KEEP_FINISHED = 1000
+
+# Journal wird ab dieser Größe neu geschrieben (nur offene + behaltene Operationen)
+COMPACT_BYTES = 1024 * 1024
+
+RETRY_BASE_SEC = 1.0
+RETRY_MAX_SEC = 60.0
+
+
+class QueueClosed(RuntimeError):
+    """Queue wurde geschlossen (Shutdown, Tenant verdrängt); Operation nicht angenommen."""
+
+
+def journal_path(directory: str, account: str) -> str:
+    """Journal-Datei eines Kontos; Operationen gehören immer zu dessen Token."""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{account}.ndjson")
+
+
+@dataclass
+class Operation:
+    """Eine angenommene Mutation; ``commands`` sind fertige Sync-Commands mit uuid."""
+    id: str
+    kind: str
+    task_id: str
+    commands: List[dict]
+    created_at: str
+    state: str = "queued"  # queued | sending | done | failed
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "operation_id": self.id,
+            "kind": self.kind,
+            "task_id": self.task_id,
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+        }
+
+    def record(self) -> dict:
+        return {
+            "event": "queued", "op": self.id, "kind": self.kind, "task_id": self.task_id,
+            "commands": self.commands, "created_at": self.created_at,
+        }
+
+
+class WriteJournal:
+    """
+    Append-only NDJSON-Datei mit Group Commit: Einträge, die während eines
+    laufenden fsync eintreffen, werden gemeinsam mit dem nächsten geschrieben.
+    ``append`` kehrt erst zurück, wenn die Einträge auf der Platte sind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._buffer: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    def replay(self) -> List[dict]:
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # abgerissene letzte Zeile nach Absturz: nie bestätigt
+                    logger.warning("Journal %s: Zeile %d unlesbar, übersprungen", self.path, number)
+        return records
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    async def append(self, *records: dict) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.extend(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        self._waiters.append(future)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        await future
+
+    async def _flush(self) -> None:
+        while self._buffer:
+            lines, waiters = self._buffer, self._waiters
+            self._buffer, self._waiters = [], []
+            try:
+                await asyncio.to_thread(self._write, "".join(lines))
+            except Exception as e:
+                for w in waiters:
+                    if not w.done():
+                        w.set_exception(e)
+                continue
+            for w in waiters:
+                if not w.done():
+                    w.set_result(None)
+
+    def _write(self, data: str) -> None:
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def rewrite(self, records: List[dict]) -> None:
+        """Journal atomar durch ``records`` ersetzen (Kompaktierung)."""
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class WriteBehindQueue:
+    """
+    Write-Behind für Task-Mutationen: ``submit`` schreibt die Operation ins
+    Journal und kehrt nach dem fsync zurück; ein Worker schickt offene
+    Operationen in Reihenfolge als Sync-Batches (``send``) und wiederholt
+    fehlgeschlagene Requests mit Backoff bis ``max_attempts``. Beim Start
+    werden unerledigte Operationen aus dem Journal erneut gesendet – die
+    Command-uuids bleiben gleich, Todoist verwirft Duplikate.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        send: Callable[[List[dict]], Awaitable[dict]],
+        on_flushed: Callable[[], None],
+        status_error: Callable[[object], Optional[str]],
+        batch_size: int,
+        max_attempts: int,
+    ):
+        self._send = send
+        self._on_flushed = on_flushed
+        self._status_error = status_error
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+
+        self.journal = WriteJournal(path)
+        self._ops: "OrderedDict[str, Operation]" = OrderedDict()
+        self._replay()
+        self._wake = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._submitting = 0  # im Journal, aber noch nicht in _ops
+        self._compacting: Optional[asyncio.Event] = None
+        self._closed = False
+
+    def _replay(self) -> None:
+        for r in self.journal.replay():
+            op = self._ops.get(r.get("op"))
+            if r.get("event") == "queued":
+                self._ops[r["op"]] = Operation(
+                    id=r["op"], kind=r["kind"], task_id=r["task_id"],
+                    commands=r["commands"], created_at=r["created_at"],
+                )
+            elif op is not None and r.get("event") in ("done", "failed"):
+                op.state, op.error = r["event"], r.get("error")
+        self._trim()
+        if self.pending:
+            logger.info("Write-Behind: %d offene Operationen aus %s", self.pending, self.journal.path)
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for op in self._ops.values() if not op.finished)
+
+    @property
+    def busy(self) -> bool:
+        """Offene oder gerade angenommene Operationen: nicht schließen."""
+        return self._submitting > 0 or self.pending > 0
+
+    def get(self, op_id: str) -> Optional[Operation]:
+        return self._ops.get(op_id)
+
+    async def submit(self, kind: str, task_id: str, commands: List[dict]) -> Operation:
+        while self._compacting is not None:
+            # Journal wird gerade ersetzt: Eintrag käme in die alte Datei
+            await self._compacting.wait()
+        if self._closed:
+            raise QueueClosed("Write-Behind-Queue ist geschlossen")
+        op = Operation(
+            id=uuid.uuid4().hex, kind=kind, task_id=task_id, commands=commands,
+            created_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        )
+        self._submitting += 1
+        try:
+            await self.journal.append(op.record())
+            self._ops[op.id] = op
+        finally:
+            self._submitting -= 1
+        WRITE_BEHIND_OPS.inc("queued")
+        self.start()
+        self._wake.set()
+        return op
+
+    # ── Worker ────────────────────────────────────────────────────────────────
+
+    def _next_batch(self) -> List[Operation]:
+        # ganze Operationen in Reihenfolge, bis batch_size Commands erreicht sind
+        batch, size = [], 0
+        for op in self._ops.values():
+            if op.finished:
+                continue
+            if batch and size + len(op.commands) > self.batch_size:
+                break
+            batch.append(op)
+            size += len(op.commands)
+        return batch
+
+    async def _finish(self, ops: List[Operation]) -> None:
+        records = []
+        for op in ops:
+            WRITE_BEHIND_OPS.inc(op.state)
+            record = {"event": op.state, "op": op.id}
+            if op.error:
+                record["error"] = op.error
+            records.append(record)
+        await self.journal.append(*records)
+
+    def _requeue(self, batch: List[Operation], error: str) -> List[Operation]:
+        """Gesendete Operationen zurück in die Queue; nach ``max_attempts`` failed (zurückgegeben)."""
+        exhausted = []
+        for op in batch:
+            if op.state != "sending":
+                continue
+            op.error = error
+            op.state = "failed" if op.attempts >= self.max_attempts else "queued"
+            if op.finished:
+                exhausted.append(op)
+        return exhausted
+
+    async def _flush_batch(self, batch: List[Operation]) -> Optional[float]:
+        """Sendet einen Batch; gibt bei Fehlschlag die Wartezeit bis zum nächsten Versuch zurück."""
+        commands = [c for op in batch for c in op.commands]
+        for op in batch:
+            op.state = "sending"
+            op.attempts += 1
+        try:
+            result = await self._send(commands) if commands else {}
+        except httpx.HTTPError as e:
+            logger.warning("Write-Behind: Sync-Request fehlgeschlagen: %s", e)
+            exhausted = self._requeue(batch, f"Sync-Request fehlgeschlagen: {e}")
+            if exhausted:
+                await self._finish(exhausted)
+            attempt = min(op.attempts for op in batch)
+            return random.uniform(0, min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** attempt))
+
+        status = result.get("sync_status", {})
+        for op in batch:
+            errors = [e for e in (self._status_error(status.get(c["uuid"])) for c in op.commands) if e]
+            op.state = "failed" if errors else "done"
+            op.error = "; ".join(errors) or None
+        await self._finish(batch)
+        if commands:
+            self._on_flushed()
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                await self._compact()
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                delay = await self._flush_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # unerwartete Antwort, Journal nicht beschreibbar o. Ä.
+                logger.error("Write-Behind: Batch nicht verarbeitet: %s", e)
+                exhausted = self._requeue(batch, f"Batch nicht verarbeitet: {e}")
+                if exhausted:
+                    try:
+                        await self._finish(exhausted)
+                    except Exception as e:
+                        # ohne Eintrag im Journal nach Neustart erneut gesendet
+                        logger.error("Write-Behind: Abschluss nicht protokolliert: %s", e)
+                delay = RETRY_MAX_SEC
+            if delay:
+                await asyncio.sleep(delay)
+            self._trim()
+
+    def _trim(self) -> None:
+        finished = [op_id for op_id, op in self._ops.items() if op.finished]
+        for op_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._ops[op_id]
+
+    async def _compact(self) -> None:
+        # laufende submits: deren Eintrag stünde nicht in der neuen Datei;
+        # neue warten, bis die Datei ersetzt ist
+        if self._submitting or self.journal.size < COMPACT_BYTES:
+            return
+        records = []
+        for op in self._ops.values():
+            records.append(op.record())
+            if op.finished:
+                records.append({"event": op.state, "op": op.id, "error": op.error})
+        self._compacting = asyncio.Event()
+        try:
+            await asyncio.to_thread(self.journal.rewrite, records)
+        except OSError as e:
+            logger.warning("Write-Behind: Journal %s nicht kompaktiert: %s", self.journal.path, e)
+        finally:
+            compacting, self._compacting = self._compacting, None
+            compacting.set()
+
+    def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        self._closed = True
+        if self._worker is not None:
+            self._worker.cancel()
+        self.journal.close()
@@ -0,0 +1,86 @@
+# tests/test_write_behind.py
+
+import asyncio
+import threading
+import time
+import uuid
+
+from services import write_behind
+from services.write_behind import WriteBehindQueue
+
+
+def _command(task_id: str) -> dict:
+    return {"type": "item_close", "uuid": uuid.uuid4().hex, "args": {"id": task_id}}
+
+
+def _queue(path: str, send, max_attempts: int = 3) -> WriteBehindQueue:
+    return WriteBehindQueue(
+        path, send, on_flushed=lambda: None, status_error=lambda s: None,
+        batch_size=100, max_attempts=max_attempts,
+    )
+
+
+def test_submit_during_compaction_stays_in_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "COMPACT_BYTES", 0)
+    path = str(tmp_path / "journal.ndjson")
+
+    async def scenario():
+        hold = asyncio.Event()
+
+        async def send(commands):
+            await hold.wait()  # Worker bleibt im Versand hängen
+            return {}
+
+        queue = _queue(path, send)
+        first = await queue.submit("complete", "1", [_command("1")])
+
+        # Kompaktierung langsam machen, damit der zweite submit hineinfällt
+        rewrite, started = queue.journal.rewrite, threading.Event()
+
+        def slow_rewrite(records):
+            started.set()
+            time.sleep(0.2)
+            rewrite(records)
+
+        queue.journal.rewrite = slow_rewrite
+        compaction = asyncio.create_task(queue._compact())
+        await asyncio.to_thread(started.wait)
+        second = await queue.submit("complete", "2", [_command("2")])
+        await compaction
+        queue.close()
+        return first.id, second.id
+
+    ids = asyncio.run(scenario())
+
+    replayed = _queue(path, send=None)
+    try:
+        assert all(replayed.get(op_id) is not None for op_id in ids)
+    finally:
+        replayed.close()
+
+
+def test_unexpected_error_fails_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "RETRY_MAX_SEC", 0.01)
+    path = str(tmp_path / "journal.ndjson")
+
+    async def scenario():
+        async def send(commands):
+            raise ValueError("keine JSON-Antwort")
+
+        queue = _queue(path, send, max_attempts=2)
+        op = await queue.submit("complete", "1", [_command("1")])
+        for _ in range(200):
+            if op.finished:
+                break
+            await asyncio.sleep(0.01)
+        queue.close()
+        return op
+
+    op = asyncio.run(scenario())
+    assert (op.state, op.attempts) == ("failed", 2)
+
+    replayed = _queue(path, send=None)
+    try:
+        assert replayed.get(op.id).state == "failed"
+    finally:
+        replayed.close()
@@ -0,0 +1,94 @@
+# utils/due_dates.py
+
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Optional
+
+# ── Schnellpfad: ISO-Daten und häufige relative Angaben (EN/DE) ───────────────
+
+RELATIVE_DAYS = {
+    "today": 0, "heute": 0, "tonight": 0,
+    "tomorrow": 1, "morgen": 1,
+    "day after tomorrow": 2, "übermorgen": 2,
+    "yesterday": -1, "gestern": -1,
+    "next week": 7, "nächste woche": 7,
+}
+
+WEEKDAYS = {
+    "monday": 0, "montag": 0, "mon": 0, "mo": 0,
+    "tuesday": 1, "dienstag": 1, "tue": 1, "di": 1,
+    "wednesday": 2, "mittwoch": 2, "wed": 2, "mi": 2,
+    "thursday": 3, "donnerstag": 3, "thu": 3, "do": 3,
+    "friday": 4, "freitag": 4, "fri": 4, "fr": 4,
+    "saturday": 5, "samstag": 5, "sat": 5, "sa": 5,
+    "sunday": 6, "sonntag": 6, "sun": 6, "so": 6,
+}
+
+# "next monday" / "nächsten Montag": frühestens morgen, sonst ab heute
+NEXT_WORDS = {"next", "nächsten", "nächster", "nächste", "kommenden", "kommender"}
+THIS_WORDS = {"this", "on", "am", "diesen"}
+
+_ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_WEEKDAY_RE = re.compile(
+    r"^(?:(" + "|".join(sorted(NEXT_WORDS | THIS_WORDS)) + r")\s+)?("
+    + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r")$"
+)
+_IN_RE = re.compile(r"^in\s+(\d{1,3})\s+(days?|tagen?|weeks?|wochen?)$")
+
+CACHE_SIZE = 1024
+
+_cache_day: Optional[date] = None
+
+
+def _fast_path(text: str, today: date) -> Optional[date]:
+    if text in RELATIVE_DAYS:
+        return today + timedelta(days=RELATIVE_DAYS[text])
+
+    if _ISO_RE.match(text):
+        try:
+            return datetime.fromisoformat(text.upper()).date()
+        except ValueError:
+            return None
+
+    m = _WEEKDAY_RE.match(text)
+    if m:
+        ahead = (WEEKDAYS[m.group(2)] - today.weekday()) % 7
+        if ahead == 0 and m.group(1) in NEXT_WORDS:
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    m = _IN_RE.match(text)
+    if m:
+        n = int(m.group(1))
+        return today + timedelta(days=n * 7 if m.group(2)[0] in "wW" else n)
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _resolve(text: str, today: date) -> Optional[date]:
+    resolved = _fast_path(text, today)
+    if resolved is not None or _ISO_RE.match(text):
+        return resolved
+
+    # Fallback: dateparser (teurer Import, Spracherkennung) nur bei Bedarf
+    import dateparser
+    parsed = dateparser.parse(text, settings={
+        "RELATIVE_BASE": datetime.combine(today, time()),
+        "PREFER_DATES_FROM": "future",
+    })
+    return parsed.date() if parsed else None
+
+
+def resolve_due_date(due_string: str, today: Optional[date] = None) -> Optional[date]:
+    """
+    Löst einen Due-String in ein Datum auf, None wenn nicht interpretierbar.
+    Ergebnisse werden pro (normalisiertem String, Stichtag) gecacht; beim
+    Tageswechsel wird der Cache geleert.
+    """
+    global _cache_day
+    today = today or date.today()
+    if today != _cache_day:
+        _resolve.cache_clear()
+        _cache_day = today
+    return _resolve(" ".join(due_string.lower().split()), today)
@@ -1,14 +1,11 @@
 # utils/project_utils.py
 
-def resolve_project_id_by_name(client, base_url: str, headers: dict, name: str) -> str:
+async def resolve_project_id_by_name(todoist, name: str) -> str:
     """
-    Holt die Projektliste und gibt die ID zurück, die dem gegebenen Namen entspricht.
+    Sucht die Projekt-ID im gecachten Projekt-Index des TodoistService.
     Wirft ValueError, wenn nicht gefunden.
     """
-    resp = client.get(f"{base_url}/projects", headers=headers)
-    resp.raise_for_status()
-    projects = resp.json()
-    match = next((p for p in projects if p["name"].lower() == name.lower()), None)
-    if not match:
+    project_id = await todoist.projects.resolve(name)
+    if not project_id:
         raise ValueError(f"Projekt '{name}' nicht gefunden")
-    return match["id"]
\ No newline at end of file
+    return project_id